@@ -1,9 +1,15 @@
-from collections import deque  # used for generating a DFA
+from array import array  # flat transition tables for compiled DFAs
+from collections import deque, OrderedDict  # generating DFAs; LRU cache of lazy states
+from collections.abc import MutableMapping  # compact node storage
+import codecs  # incremental decoding of byte streams
+import heapq  # freed node ids
+from bisect import bisect_right  # ranges of skipped node ids
 
 from classState import *
 
 
 class DFANode:
+    __slots__ = ('id', 'name', 'transitions', 'is_final', 'is_initial', 'center', 'dfa')
 
     def __init__(self, name, center=None, initial=False, final=False, id=-1):
         self.id = id
@@ -12,6 +18,7 @@ class DFANode:
         self.is_final = final
         self.is_initial = initial
         self.center = center  # location of representation in GUI
+        self.dfa = None  # DFA this node belongs to, set by DFA.add_node
 
     def __str__(self):
         t = ', '.join(sorted(['({0} -> {1})'.format(k, v) for k, v in self.transitions.items()]))
@@ -19,31 +26,341 @@ class DFANode:
 
     def add_transition(self, char, ident):
         # add transition on char to state#ident
+        old = self.transitions.get(char, -1)
         self.transitions[char] = ident
+        if self.dfa is not None:
+            self.dfa.transition_changed(self.id, char, old, ident)
+
+    def remove_transition(self, char):
+        # remove the transition on char, if any
+        old = self.transitions.pop(char, -1)
+        if self.dfa is not None and old >= 0:
+            self.dfa.transition_changed(self.id, char, old, -1)
 
     def get_transition_on(self, char):
         # get the destination state, default -1 if no such transition
         return self.transitions.get(char, -1)
 
     def get_transition_to(self, dest_state):
-        # get
-        pass
+        # get the sorted symbols that lead from this node to state#dest_state
+        if self.dfa is not None:
+            return sorted(c for src, c in self.dfa.reverse_index().get(dest_state, ()) if src == self.id)
+        return sorted(c for c, dest in self.transitions.items() if dest == dest_state)
 
     def getCenter(self):
         return self.center
 
 
+class DFANodeView(DFANode):
+    # A DFANode whose data lives in a row of a NodeTable
+    # vars:
+    # store - NodeTable holding the row
+    # id - row index
+    # transitions is rebuilt from the row on every access; use add_transition to edit
+    __slots__ = ('store',)
+
+    def __init__(self, store, ident):
+        self.store = store
+        self.id = ident
+
+    def __eq__(self, other):
+        return isinstance(other, DFANodeView) and other.store is self.store and other.id == self.id
+
+    def __hash__(self):
+        return hash((id(self.store), self.id))
+
+    name = property(lambda self: self.store.names[self.id],
+                    lambda self, name: self.store.names.__setitem__(self.id, name))
+    is_final = property(lambda self: self.store.final[self.id] == 1,
+                        lambda self, final: self.store.set_flag(self.store.final, self.id, final))
+    is_initial = property(lambda self: self.store.initial[self.id] == 1,
+                          lambda self, initial: self.store.set_flag(self.store.initial, self.id, initial))
+    center = property(lambda self: self.store.get_center(self.id),
+                      lambda self, center: self.store.set_center(self.id, center))
+    transitions = property(lambda self: self.store.get_transitions(self.id))
+    dfa = property(lambda self: self.store.dfa)
+
+    def add_transition(self, char, ident):
+        old = self.store.get_transition(self.id, char)
+        self.store.set_transition(self.id, char, ident)
+        if self.store.dfa is not None:
+            self.store.dfa.transition_changed(self.id, char, old, ident)
+
+    def remove_transition(self, char):
+        old = self.store.get_transition(self.id, char)
+        if old >= 0:
+            self.store.set_transition(self.id, char, -1)
+            if self.store.dfa is not None:
+                self.store.dfa.transition_changed(self.id, char, old, -1)
+
+    def get_transition_on(self, char):
+        return self.store.get_transition(self.id, char)
+
+
+class NodeTable(MutableMapping):
+    # Compact node storage for DFA(compact=True): every node is a row in parallel arrays
+    # vars:
+    # dfa - DFA using this table
+    # symbols {} - symbol -> column index, in order of first use
+    # width - number of columns per row
+    # table array('i') - flat rows*width transition matrix, -1 if no transition
+    # final, initial, live bytearray - per-row flags
+    # names [] - row -> state name
+    # xs, ys array('d') - row -> GUI position (nan if unset); None until a center is set
+    # count - number of live rows
+
+    def __init__(self, dfa, alphabet=()):
+        self.dfa = dfa
+        self.symbols = {}
+        for alpha in alphabet:
+            self.symbols.setdefault(alpha, len(self.symbols))
+        self.width = len(self.symbols)
+        self.table = array('i')
+        self.final = bytearray()
+        self.initial = bytearray()
+        self.live = bytearray()
+        self.names = []
+        self.xs = self.ys = None
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, ident):
+        return isinstance(ident, int) and 0 <= ident < len(self.live) and self.live[ident] == 1
+
+    def __iter__(self):
+        live = self.live
+        return (ident for ident in range(len(live)) if live[ident])
+
+    def __getitem__(self, ident):
+        if ident not in self:
+            raise KeyError(ident)
+        return DFANodeView(self, ident)
+
+    def __setitem__(self, ident, node):
+        # copy node into row ident; the row can then be reached through self[ident]
+        self.grow(ident + 1)
+        if not self.live[ident]:
+            self.live[ident] = 1
+            self.count += 1
+        self.names[ident] = node.name
+        self.final[ident] = 1 if node.is_final else 0
+        self.initial[ident] = 1 if node.is_initial else 0
+        self.set_center(ident, node.center)
+        base = ident * self.width
+        self.table[base:base + self.width] = array('i', [-1]) * self.width
+        for char, dest in node.transitions.items():
+            self.set_transition(ident, char, dest)
+
+    def __delitem__(self, ident):
+        if ident not in self:
+            raise KeyError(ident)
+        self.live[ident] = self.final[ident] = self.initial[ident] = 0
+        self.names[ident] = None
+        base = ident * self.width
+        self.table[base:base + self.width] = array('i', [-1]) * self.width
+        self.set_center(ident, None)
+        self.count -= 1
+
+    def is_dense(self):
+        # True if rows 0..count-1 are all in use, so row index == node id
+        return self.count == len(self.live)
+
+    def own(self):
+        # copy arrays that are views into a mapped file (see dfafile) into
+        # ordinary arrays, so they can change size
+        if isinstance(self.table, memoryview):
+            self.table = array('i', self.table.tobytes())
+        if isinstance(self.xs, memoryview):
+            self.xs = array('d', self.xs.tobytes())
+            self.ys = array('d', self.ys.tobytes())
+
+    def grow(self, rows):
+        extra = rows - len(self.live)
+        if extra <= 0:
+            return
+        self.own()
+        self.table.extend(array('i', [-1]) * (extra * self.width))
+        self.final.extend(bytes(extra))
+        self.initial.extend(bytes(extra))
+        self.live.extend(bytes(extra))
+        self.names.extend([None] * extra)
+        if self.xs is not None:
+            self.xs.extend(array('d', [float('nan')]) * extra)
+            self.ys.extend(array('d', [float('nan')]) * extra)
+
+    def add_symbol(self, char):
+        # new column: rebuild the table one row wider
+        self.own()
+        col = self.symbols[char] = self.width
+        rows, old = len(self.live), self.table
+        self.width += 1
+        table = array('i', [-1]) * (rows * self.width)
+        for r in range(rows):
+            table[r * self.width:r * self.width + col] = old[r * col:(r + 1) * col]
+        self.table = table
+        return col
+
+    def set_flag(self, flags, ident, value):
+        flags[ident] = 1 if value else 0
+        if self.dfa is not None:
+            self.dfa.invalidate()
+
+    def set_transition(self, ident, char, dest):
+        col = self.symbols.get(char)
+        if col is None:
+            col = self.add_symbol(char)
+        self.table[ident * self.width + col] = dest
+
+    def get_transition(self, ident, char):
+        col = self.symbols.get(char)
+        return -1 if col is None else self.table[ident * self.width + col]
+
+    def get_transitions(self, ident):
+        base = ident * self.width
+        row = self.table
+        return {c: row[base + col] for c, col in self.symbols.items() if row[base + col] >= 0}
+
+    def get_center(self, ident):
+        if self.xs is None or self.xs[ident] != self.xs[ident]:  # nan: unset
+            return None
+        return Point(self.xs[ident], self.ys[ident])
+
+    def set_center(self, ident, center):
+        if center is None:
+            if self.xs is not None:
+                self.xs[ident] = self.ys[ident] = float('nan')
+            return
+        if self.xs is None:
+            self.xs = array('d', [float('nan')]) * len(self.live)
+            self.ys = array('d', [float('nan')]) * len(self.live)
+        self.xs[ident] = center.getX()
+        self.ys[ident] = center.getY()
+
+
+class IdAllocator:
+    # Hands out node ids that are never already in use
+    # vars:
+    # next_id - high-water mark: no id >= next_id has been handed out
+    # heap [] - min-heap of freed ids below next_id (may hold stale entries)
+    # freed {} - the ids in heap that are really free
+    # gap_starts [], gap_ends [] - ranges of ids skipped over by claim, sorted and disjoint;
+    #                              kept as ranges so claiming a large id costs O(1), not O(id)
+    # gap_first - index of the first range not yet used up by allocate
+    # taken {} - ids inside the ranges that are in use after all
+    # free_count - number of free ids below next_id
+
+    def __init__(self, next_id=0, freed=()):
+        self.next_id = next_id
+        self.freed = set(freed)
+        self.heap = sorted(self.freed)
+        self.gap_starts = []
+        self.gap_ends = []
+        self.gap_first = 0
+        self.taken = set()
+        self.free_count = len(self.freed)
+
+    def __len__(self):
+        # number of ids in use
+        return self.next_id - self.free_count
+
+    def in_gap(self, ident):
+        # whether ident lies in one of the skipped ranges, free or taken
+        i = bisect_right(self.gap_starts, ident) - 1
+        return i >= self.gap_first and ident < self.gap_ends[i]
+
+    def lowest_gap(self):
+        # lowest free id in the skipped ranges, -1 if none; drops used up ranges on the way
+        starts, ends = self.gap_starts, self.gap_ends
+        while self.gap_first < len(starts):
+            i = self.gap_first
+            start = starts[i]
+            if start >= ends[i]:
+                self.gap_first += 1
+            elif start in self.taken:
+                self.taken.remove(start)
+                starts[i] = start + 1
+            else:
+                return start
+        return -1
+
+    def allocate(self):
+        # lowest freed or skipped id, else the next fresh one; O(log n)
+        while self.heap and self.heap[0] not in self.freed:
+            heapq.heappop(self.heap)
+        gap = self.lowest_gap()
+        if self.heap and (gap < 0 or self.heap[0] < gap):
+            ident = heapq.heappop(self.heap)
+            self.freed.remove(ident)
+        elif gap >= 0:
+            ident = gap
+            self.gap_starts[self.gap_first] = gap + 1
+        else:
+            self.next_id += 1
+            return self.next_id - 1
+        self.free_count -= 1
+        return ident
+
+    def free(self, ident):
+        if ident >= self.next_id or ident in self.freed:
+            return
+        if self.in_gap(ident):
+            if ident in self.taken:
+                self.taken.remove(ident)
+                self.free_count += 1
+            return
+        self.freed.add(ident)
+        heapq.heappush(self.heap, ident)
+        self.free_count += 1
+
+    def claim(self, ident):
+        # mark an id chosen by the caller as in use; ids skipped over become free
+        if ident >= self.next_id:
+            if ident > self.next_id:
+                self.gap_starts.append(self.next_id)
+                self.gap_ends.append(ident)
+                self.free_count += ident - self.next_id
+            self.next_id = ident + 1
+        elif ident in self.freed:
+            self.freed.remove(ident)  # its heap entry is dropped when popped
+            self.free_count -= 1
+        elif self.in_gap(ident) and ident not in self.taken:
+            self.taken.add(ident)
+            self.free_count -= 1
+
+    def reserve(self, count):
+        # count consecutive fresh ids above the high-water mark
+        start = self.next_id
+        self.next_id += count
+        return range(start, start + count)
+
+
 class DFA:
     # vars
-    # nodes {} - dict of nodes in this dfa
+    # nodes {} - dict of nodes in this dfa (a NodeTable for a compact DFA)
     # initial - initial node of the FA
     # final {} - set of final/accepting nodes in the dfa
+    # incoming {} - node id -> set of (source id, symbol) transitions into it;
+    #               None until reverse_index() first builds it
+    # transition_count - number of transitions; None until summary() first counts them
+    # changes [] - lines describing edits since the last pop_changes(); None unless log_changes() was called
 
-    def __init__(self):
-        self.nodes = {}
+    def __init__(self, compact=False, alphabet=()):
+        """
+        :param compact: store nodes as rows of typed arrays (see NodeTable)
+                        instead of DFANode objects. nodes[id] then returns a
+                        DFANodeView; add_node copies the node it is given
+        :param alphabet: symbols to reserve table columns for (compact only)
+        """
+        self.nodes = NodeTable(self, alphabet) if compact else {}
         self.initial = None
         self.final = set()
-        self.free_ids = set()
+        self.ids = IdAllocator()
+        self.compiled = None  # CompiledDFA cache, cleared on any edit
+        self.incoming = None
+        self.transition_count = None
+        self.changes = None
 
     def __str__(self):
         return 'DFA containing {0} nodes'.format(len(self.nodes))
@@ -58,39 +375,575 @@ class DFA:
             node.id = id
         if id in self.nodes:
             return False
+        self.ids.claim(id)
         self.nodes[id] = node
+        if not isinstance(self.nodes, NodeTable):
+            node.dfa = self
+        if self.incoming is not None:
+            for c, dest in node.transitions.items():
+                self.incoming.setdefault(dest, set()).add((id, c))
+        if self.transition_count is not None:
+            self.transition_count += len(node.transitions)
+        if self.changes is not None:
+            self.changes.append('+ state {0}'.format(self.describe(id)))
+        self.invalidate()
         return True
 
     def remove_node(self, node):
-        print('removing node', node)
+        """
+        Removes node and every transition into it, in time proportional to the
+        node's own edges (see reverse_index).
+        :return: the removed node with its outgoing transitions, None if node
+                 was not in this DFA. In a compact DFA, node is a view of a
+                 row that is cleared here, so a detached DFANode copy is
+                 returned instead
+        """
         if node.id in self.nodes:
+            incoming = self.reverse_index()
+            node = self.nodes[node.id]
+            if isinstance(self.nodes, NodeTable):
+                snapshot = DFANode(node.name, center=node.center, initial=node.is_initial,
+                                   final=node.is_final, id=node.id)
+                snapshot.transitions = node.transitions
+            else:
+                snapshot = node
+            for src, c in incoming.pop(node.id, ()):
+                if src != node.id:
+                    self.nodes[src].remove_transition(c)
+            outgoing = node.transitions
+            for c, dest in outgoing.items():
+                edges = incoming.get(dest)
+                if edges is not None:
+                    edges.discard((node.id, c))
+            if self.transition_count is not None:
+                self.transition_count -= len(outgoing)
+            if self.changes is not None:
+                self.changes.append('- state {0}'.format(self.describe(node.id)))
+            self.final.discard(node)
+            if self.initial == node.id:
+                self.initial = None
             self.nodes.pop(node.id)
-            self.free_ids.add(node.id)
-            # todo transitions to/from node
+            self.ids.free(node.id)
+            if not isinstance(self.nodes, NodeTable):
+                node.dfa = None
+            self.invalidate()
+            return snapshot
+        return None
+
+    def reverse_index(self):
+        """
+        Index of transitions by destination. Built with one pass over all
+        transitions on first use, then kept up to date by add_node,
+        remove_node and DFANode.add_transition/remove_transition.
+        :return: dict, node id -> set of (source id, symbol)
+        """
+        if self.incoming is None:
+            self.incoming = {}
+            for ident, node in self.nodes.items():
+                for c, dest in node.transitions.items():
+                    self.incoming.setdefault(dest, set()).add((ident, c))
+        return self.incoming
+
+    def transition_changed(self, ident, char, old, new):
+        # called by DFANode when its transition on char moves from old to new (-1: none)
+        if self.incoming is not None:
+            if old >= 0:
+                edges = self.incoming.get(old)
+                if edges is not None:
+                    edges.discard((ident, char))
+            if new >= 0:
+                self.incoming.setdefault(new, set()).add((ident, char))
+        if self.transition_count is not None:
+            self.transition_count += (new >= 0) - (old >= 0)
+        if self.changes is not None and old != new:
+            if old < 0:
+                self.changes.append('+ {0} -{1}-> {2}'.format(self.describe(ident), char, self.describe(new)))
+            elif new < 0:
+                self.changes.append('- {0} -{1}-> {2}'.format(self.describe(ident), char, self.describe(old)))
+            else:
+                self.changes.append('~ {0} -{1}-> {2} (was {3})'.format(
+                    self.describe(ident), char, self.describe(new), self.describe(old)))
+        self.invalidate()
+
+    def set_initial(self, ident, initial=True):
+        """
+        Marks state#ident as the initial state, or unmarks it. The previous
+        initial state is unmarked first. Only actual changes are logged.
+        :return: id of the state that stopped being initial to make room, None if none
+        """
+        node = self.nodes[ident]
+        previous = None
+        if initial and self.initial is not None and self.initial != ident and self.initial in self.nodes:
+            previous = self.initial
+            self.set_initial(previous, False)
+        if node.is_initial == initial and (self.initial == ident) == initial:
+            return previous
+        node.is_initial = initial
+        if initial:
+            self.initial = ident
+        elif self.initial == ident:
+            self.initial = None
+        if self.changes is not None:
+            self.changes.append('* {0} {1}initial'.format(self.describe(ident), '' if initial else 'not '))
+        self.invalidate()
+        return previous
+
+    def set_final(self, ident, final=True):
+        # mark state#ident as accepting, or not; only an actual change is logged
+        node = self.nodes[ident]
+        if node.is_final == final:
+            return
+        node.is_final = final
+        if final:
+            self.final.add(node)
+        else:
+            self.final.discard(node)
+        if self.changes is not None:
+            self.changes.append('* {0} {1}final'.format(self.describe(ident), '' if final else 'not '))
+        self.invalidate()
 
     def get_free_id(self):
-        f = len(self.nodes)
-        if len(self.free_ids) > 0: f = self.free_ids.pop()
-        return f
+        # an id no node uses, lowest freed id first
+        return self.ids.allocate()
+
+    def reserve_ids(self, count):
+        # a block of count consecutive unused ids, for adding many nodes at once
+        return self.ids.reserve(count)
+
+    def invalidate(self):
+        # drop the compiled transition table; rebuilt on next compile()
+        self.compiled = None
+
+    def compile(self):
+        """
+        Flattens this DFA into an integer transition table.
+        The table is cached until the DFA is next edited.
+        :return: CompiledDFA, valid until the next edit. For a compact DFA with
+                 no removed rows it shares the NodeTable's arrays instead of
+                 copying them, so a kept CompiledDFA would see later edits;
+                 call compile() again after editing
+        """
+        if self.compiled is None:
+            self.compiled = CompiledDFA(self)
+        return self.compiled
+
+    def accepts(self, input_string):
+        # fast, silent simulation against the compiled table
+        return self.compile().accepts(input_string)
+
+    def simulate_many(self, strings):
+        """
+        Simulates a whole batch of inputs in lockstep. Requires numpy.
+        :param strings: list of input strings
+        :return: numpy bool array, True where the string is accepted
+        """
+        return self.compile().simulate_many(strings)
+
+    def simulate_stream(self, stream, on_final=None, chunk_size=1 << 16):
+        """
+        Simulates input read piece by piece, in constant memory.
+        :param stream: file-like object with read(), e.g. an open file or mmap,
+                        or any iterable of str/bytes chunks. bytes are decoded as UTF-8;
+                        invalid or truncated UTF-8 rejects
+        :param on_final: function. called with the number of characters read
+                        every time the machine is in a final state
+        :param chunk_size: read size used for file-like objects
+        :return: True if the machine is in a final state at end of stream
+        """
+        return self.compile().scan(stream, on_final, chunk_size)
+
+    def save(self, path, names=True, layout=True):
+        # write this DFA to a binary file, see dfafile.py
+        import dfafile
+        dfafile.save(self, path, names, layout)
+
+    @staticmethod
+    def open(path):
+        # open a binary DFA file written by save, memory-mapped; see dfafile.py
+        import dfafile
+        return dfafile.load(path)
+
+    def render(self, path, scale=1.0):
+        # draw this DFA to an .svg or .png file without a window; see render.py
+        import render
+        render.render(self, path, scale)
 
     def print(self):
-        print('initial state id:', self.initial, ' (name: "'+self.nodes[self.initial].name+'")')
+        # dump every node and transition; proportional to the size of the DFA, see summary() for a cheap view
+        if self.initial in self.nodes:
+            print('initial state id:', self.initial, ' (name: "'+self.nodes[self.initial].name+'")')
+        else:
+            print('no initial state')
         for key in self.nodes.keys():
             print(key, ':', self.nodes[key])
 
+    def describe(self, ident):
+        # name of state#ident for log lines, or its id if it is not in this DFA
+        node = self.nodes.get(ident)
+        return '"{0}"'.format(node.name) if node is not None else '#' + str(ident)
+
+    def summary(self):
+        """
+        One line with the size of this DFA. Transitions are counted once on
+        first call and then kept up to date by every edit, so later calls are O(1).
+        """
+        if self.transition_count is None:
+            self.transition_count = sum(len(node.transitions) for node in self.nodes.values())
+        return '{0} states, {1} transitions, {2} final, initial {3}'.format(
+            len(self.nodes), self.transition_count, len(self.final),
+            self.describe(self.initial) if self.initial in self.nodes else 'none')
+
+    def log_changes(self):
+        # start recording a line per edit, collected with pop_changes()
+        if self.changes is None:
+            self.changes = []
+
+    def pop_changes(self):
+        """
+        :return: list of lines describing the edits since the last call, e.g.
+                '+ state "q3"', '- "q1" -a-> "q2"', '~ "q1" -a-> "q2" (was "q0")'
+        """
+        if self.changes is None:
+            return []
+        changes, self.changes = self.changes, []
+        return changes
+
     def simulate(self, input_string, debug=False):
-        state = self.initial
-        if(debug): print("state {0:2} ({1})".format(state, self.nodes[state].name))
-        for char in input_string:
-            state = self.nodes[state].get_transition_on(char)
-            if (debug): print("state {0:2} ({1})".format(state, self.nodes[state].name))
-            if state == -1:
-                print('simulation error')
-                return
-        if self.nodes[state].is_final:
-            print('string accepted')
-        else:
-            print('string not accepted')
+        """
+        Runs input_string through this DFA. Nothing is printed.
+        :param input_string: string to simulate
+        :param debug: also record the ids of every state visited
+        :return: SimulationResult
+        """
+        return self.compile().simulate(input_string, debug)
+
+    def print_trace(self, result):
+        # print a recorded trace one state per line, as simulate(debug=True) used to
+        for ident in result.trace:
+            print("state {0:2} ({1})".format(ident, self.nodes[ident].name))
+
+    def minimize(self):
+        """
+        Builds the minimal DFA for the same language using Hopcroft's
+        partition refinement. Unreachable states and dead states (states
+        that can never reach a final state) are dropped.
+        Each new state takes the name of the lowest-id state it merges.
+        :return: new DFA, initial state id 0
+        """
+        table = self.compile()
+        rows, width = len(table.ids), table.width
+        live = table.live_rows()
+        if table.initial < 0 or not live[table.initial]:
+            # empty language: a lone non-final initial state
+            dfa = DFA()
+            name = self.nodes[self.initial].name if self.initial in self.nodes else 'q0'
+            dfa.add_node(DFANode(name, initial=True, id=0))
+            dfa.initial = 0
+            return dfa
+
+        # renumber live rows 0..m-1; m is the sink standing in for everything else
+        states = [r for r in range(rows) if live[r]]
+        index = array('i', [-1]) * rows
+        for i, r in enumerate(states):
+            index[r] = i
+        m = len(states)
+        sink = m
+        delta = array('i', [sink]) * ((m + 1) * width)
+        inverse = [[[] for _ in range(m + 1)] for _ in range(width)]
+        for i in range(m + 1):
+            base = i * width
+            for c in range(width):
+                t = table.table[states[i] * width + c] if i < m else -1
+                t = index[t] if t >= 0 else -1
+                t = sink if t < 0 else t
+                delta[base + c] = t
+                inverse[c][t].append(i)
+
+        # blocks are runs of elems: block b holds elems[first[b]:end[b]], and pos[i] is where state i sits.
+        # Marking a state swaps it to the tail of its block, so a split cuts off the tail and touches
+        # only the marked states
+        # initial partition: final / non-final (the sink is non-final)
+        finals = [i for i in range(m) if table.accept[states[i]]]
+        others = [i for i in range(m) if not table.accept[states[i]]] + [sink]
+        elems = array('i', finals + others)
+        pos = array('i', [0]) * (m + 1)
+        for j, i in enumerate(elems):
+            pos[i] = j
+        block_of = array('i', [0]) * (m + 1)
+        first, end = array('i'), array('i')
+        for members in (finals, others):
+            if members:
+                for i in members:
+                    block_of[i] = len(first)
+                first.append(end[-1] if end else 0)
+                end.append(first[-1] + len(members))
+        blocks = len(first)
+        marks = array('i', [0]) * blocks  # marked states at the tail of each block
+        pending = [bytearray(width) for _ in range(blocks)]
+        work = deque()
+        smaller = min(range(blocks), key=lambda b: end[b] - first[b])
+        for c in range(width):
+            work.append((smaller, c))
+            pending[smaller][c] = 1
+
+        while work:
+            splitter, c = work.popleft()
+            pending[splitter][c] = 0
+            # mark states with a transition on c into the splitter
+            inv = inverse[c]
+            touched = []
+            for t in elems[first[splitter]:end[splitter]]:
+                for i in inv[t]:
+                    b = block_of[i]
+                    k = marks[b]
+                    tail = end[b] - 1 - k
+                    j = pos[i]
+                    if j > tail:  # already marked
+                        continue
+                    other = elems[tail]
+                    elems[tail], elems[j] = i, other
+                    pos[i], pos[other] = tail, j
+                    if k == 0:
+                        touched.append(b)
+                    marks[b] = k + 1
+            for b in touched:
+                inside = marks[b]
+                marks[b] = 0
+                outside = end[b] - first[b] - inside
+                if outside == 0:
+                    continue
+                new_block = blocks
+                blocks += 1
+                split = end[b] - inside
+                first.append(split)
+                end.append(end[b])
+                end[b] = split
+                marks.append(0)
+                pending.append(bytearray(width))
+                for j in range(split, split + inside):
+                    block_of[elems[j]] = new_block
+                for d in range(width):
+                    if pending[b][d]:
+                        target = new_block
+                    else:
+                        target = new_block if inside <= outside else b
+                    if not pending[target][d]:
+                        pending[target][d] = 1
+                        work.append((target, d))
+
+        # emit blocks in BFS order from the initial block, skipping the sink's
+        symbols = sorted(table.symbols, key=table.symbols.get)
+        dead = block_of[sink]
+        start = block_of[index[table.initial]]
+        new_ids = {start: 0}
+        queue = deque([start])
+        dfa = DFA()
+        while queue:
+            b = queue.popleft()
+            rep = min(elems[first[b]:end[b]], key=lambda i: table.ids[states[i]])
+            old = self.nodes[table.ids[states[rep]]]
+            node = DFANode(old.name, initial=(b == start), final=old.is_final, id=new_ids[b])
+            dfa.add_node(node)
+            if node.is_final:
+                dfa.final.add(node)
+            for c in range(width):
+                to = block_of[delta[rep * width + c]]
+                if to == dead:
+                    continue
+                if to not in new_ids:
+                    new_ids[to] = len(new_ids)
+                    queue.append(to)
+                node.add_transition(symbols[c], new_ids[to])
+        dfa.initial = 0
+        return dfa
+
+    def product(self, other, mode='intersection'):
+        """
+        Runs this DFA and other side by side (product construction).
+        Only pairs of states reachable from the pair of initial states are
+        built, and pairs that can never accept under mode are left out.
+        A missing transition on one side counts as a dead state on that side.
+        :param other: DFA
+        :param mode: 'union', 'intersection', 'difference' (self minus other)
+                        or 'symmetric_difference'
+        :return: new DFA, states named '(self name, other name)'
+        """
+        accept = PRODUCT_MODES[mode]
+        left, right = self.compile(), other.compile()
+        alphabet = sorted(set(left.symbols) | set(right.symbols))
+
+        # a side that is dead stays dead; can the other side still win?
+        left_dead = accept(False, False) or accept(False, True)
+        right_dead = accept(False, False) or accept(True, False)
+
+        def viable(p, q):
+            if p < 0 and q < 0:
+                return accept(False, False)
+            if p < 0:
+                return left_dead
+            if q < 0:
+                return right_dead
+            return True
+
+        def make_node(pair, node_id):
+            p, q = pair
+            name = '({0}, {1})'.format(self.nodes[left.ids[p]].name if p >= 0 else '∅',
+                                       other.nodes[right.ids[q]].name if q >= 0 else '∅')
+            final = accept(p >= 0 and left.accept[p] == 1, q >= 0 and right.accept[q] == 1)
+            node = DFANode(name, initial=(node_id == 0), final=final, id=node_id)
+            dfa.add_node(node)
+            if final:
+                dfa.final.add(node)
+            return node
+
+        dfa = DFA()
+        first = (left.initial, right.initial)
+        if not viable(*first):
+            return dfa
+        new_pairs = deque()
+        new_pairs.append(first)
+        ready_pairs = {first: 0}
+        make_node(first, 0)
+        dfa.initial = 0
+        while len(new_pairs) > 0:
+            pair = new_pairs.popleft()
+            node = dfa.nodes[ready_pairs[pair]]
+            for alpha in alphabet:
+                to_pair = (left.step(pair[0], alpha), right.step(pair[1], alpha))
+                if to_pair not in ready_pairs:
+                    if not viable(*to_pair):
+                        continue
+                    # trace a new pair, add to DFA
+                    new_pairs.append(to_pair)
+                    ready_pairs[to_pair] = len(dfa.nodes)
+                    make_node(to_pair, ready_pairs[to_pair])
+                node.add_transition(alpha, ready_pairs[to_pair])
+        return dfa
+
+    def union(self, other):
+        return self.product(other, 'union')
+
+    def intersection(self, other):
+        return self.product(other, 'intersection')
+
+    def difference(self, other):
+        return self.product(other, 'difference')
+
+    def symmetric_difference(self, other):
+        return self.product(other, 'symmetric_difference')
+
+    def equivalent(self, other):
+        """
+        Tests whether this DFA and other accept the same language, using the
+        Hopcroft-Karp union-find algorithm (near-linear, no minimization and
+        no full product). If they differ, a breadth-first search over state
+        pairs recovers a shortest string that tells them apart.
+        :param other: DFA
+        :return: EquivalenceResult, true if equivalent; otherwise its
+                 counterexample is a shortest string telling them apart
+        """
+        left, right = self.compile(), other.compile()
+        alphabet = sorted(set(left.symbols) | set(right.symbols))
+        # element ids: left rows, left dead state, right rows, right dead state
+        left_dead = len(left.ids)
+        offset = left_dead + 1
+        right_dead = offset + len(right.ids)
+        parent = array('i', range(right_dead + 1))
+        size = array('i', [1]) * (right_dead + 1)
+
+        def find(x):
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        def accepted(p, q):
+            return (p >= 0 and left.accept[p] == 1), (q >= 0 and right.accept[q] == 1)
+
+        first = (left.initial, right.initial)
+        parent[right_dead if first[1] < 0 else offset + first[1]] = left_dead if first[0] < 0 else first[0]
+        size[left_dead if first[0] < 0 else first[0]] += 1
+        stack = [first]
+        while stack:
+            p, q = stack.pop()
+            in_left, in_right = accepted(p, q)
+            if in_left != in_right:
+                return EquivalenceResult(False, self.distinguish(other, alphabet))
+            for alpha in alphabet:
+                p2, q2 = left.step(p, alpha), right.step(q, alpha)
+                a = find(left_dead if p2 < 0 else p2)
+                b = find(right_dead if q2 < 0 else offset + q2)
+                if a != b:
+                    if size[a] < size[b]:
+                        a, b = b, a
+                    parent[b] = a
+                    size[a] += size[b]
+                    stack.append((p2, q2))
+        return EquivalenceResult(True)
+
+    def distinguish(self, other, alphabet):
+        # shortest string accepted by exactly one of self and other, None if none
+        left, right = self.compile(), other.compile()
+        first = (left.initial, right.initial)
+        came_from = {first: None}
+        queue = deque([first])
+        while queue:
+            pair = queue.popleft()
+            p, q = pair
+            if (p >= 0 and left.accept[p] == 1) != (q >= 0 and right.accept[q] == 1):
+                symbols = []
+                while came_from[pair] is not None:
+                    pair, alpha = came_from[pair]
+                    symbols.append(alpha)
+                return ''.join(reversed(symbols))
+            for alpha in alphabet:
+                to_pair = (left.step(p, alpha), right.step(q, alpha))
+                if to_pair not in came_from and to_pair != (-1, -1):
+                    came_from[to_pair] = (pair, alpha)
+                    queue.append(to_pair)
+        return None
+
+    def complement(self, alphabet=()):
+        """
+        Builds a DFA accepting exactly the strings this one rejects.
+        Missing transitions are sent to a new non-accepting sink first, so
+        the copy is total over this DFA's symbols plus alphabet.
+        States keep their ids, names and positions.
+        :param alphabet: extra symbols the complement should be total over
+        :return: new DFA
+        """
+        symbols = set(alphabet)
+        for node in self.nodes.values():
+            symbols.update(node.transitions.keys())
+        symbols = sorted(symbols)
+
+        dfa = DFA()
+        for ident, node in self.nodes.items():
+            copy = DFANode(node.name, center=node.center, initial=node.is_initial,
+                           final=not node.is_final, id=ident)
+            copy.transitions = dict(node.transitions)
+            dfa.add_node(copy)
+        dfa.initial = self.initial if self.initial in self.nodes else None
+
+        sink = None
+        for node in list(dfa.nodes.values()):
+            for alpha in symbols:
+                if node.transitions.get(alpha, -1) not in dfa.nodes:
+                    if sink is None:
+                        sink = DFANode('∅', final=True)
+                        dfa.add_node(sink)
+                    node.add_transition(alpha, sink.id)
+        if dfa.initial is None:
+            # nothing was accepted, so everything is
+            sink = sink or DFANode('∅', final=True)
+            dfa.add_node(sink)
+            sink.is_initial = True
+            dfa.initial = sink.id
+        if sink is not None:
+            for alpha in symbols:
+                sink.add_transition(alpha, sink.id)
+        dfa.final = {node for node in dfa.nodes.values() if node.is_final}
+        return dfa
 
     def inflate(self, win, vertical_offset):
         """
@@ -100,43 +953,91 @@ class DFA:
         Objects are drawn into win.
         :return: list of State objects inflated
         """
-        def layout(num_nodes, win_padding=60):
-            aspect_ratio = (win.getWidth() - 2 * win_padding)\
-                           / (win.getHeight() - 2 * win_padding - vertical_offset)
-            nodes_tall = int(math.sqrt(num_nodes/aspect_ratio))
-            nodes_wide = int(num_nodes / nodes_tall)
-            hspace = (win.getWidth() - 2 * win_padding) // nodes_wide
-            vspace = (win.getHeight() - 2 * win_padding) // nodes_tall
-            for j in range(nodes_tall + 1):
-                for i in range(nodes_wide + 1):
-                    x = win_padding + i * hspace
-                    y = vertical_offset + win_padding + j * vspace + (i%2)*(vspace//4)
-                    yield Point(x, y)
-            while True: yield Point(50, vertical_offset+50)  # in case of overflow
-        position_generator = layout(len(self.nodes))
+        self.place_missing((60, vertical_offset + 60, win.getWidth() - 60, win.getHeight() - 60))
 
         states = []
-        state_ids = []
-        # construct all State objects
-        for k in self.nodes:
-            if self.nodes[k].center is None:
-                self.nodes[k].center = next(position_generator)
-            s = State(self.nodes[k])
-            s.draw(win)
-            states.append(s)
-            state_ids.append(k)
-        for s in states:
-            # for each state's OUTGOING transitions:
-            for c, t_id in s.node.transitions.items():
-                t = Transition(s, states[state_ids[t_id]], c)
-                t.draw(win)
+        state_of = {}  # node id -> State
+        drawing = drawing_of(win)
+        autoflush, win.autoflush = win.autoflush, False  # one screen update at the end, not one per item
+        try:
+            # construct all State objects
+            for k, node in self.nodes.items():
+                s = State(node, drawing)
+                s.draw(win)
+                states.append(s)
+                state_of[k] = s
+
+            # one Transition per (source, destination) pair, holding all its symbols
+            edges = self.edge_groups()
+            pairs = {}  # (lower id, higher id) -> parallel_points of the pair, for edges that go both ways
+            for (src, dest), symbols in edges.items():
+                s, d = state_of[src], state_of[dest]
+                t = Transition(s, d, symbols)
+                if src == dest:
+                    t.self_transition(win)
+                elif (dest, src) in edges:
+                    low, high = min(src, dest), max(src, dest)
+                    if (low, high) not in pairs:
+                        pairs[low, high] = state_of[low].parallel_points(state_of[high])
+                    forward, backward = pairs[low, high]
+                    if src == low:
+                        t.draw_line(win, *forward, above=False)
+                    else:
+                        t.draw_line(win, *backward, above=True)
+                else:
+                    t.draw_line(win, *t.straight_points())
+                t.reindex()
                 s.add_transition(t)
-                states[state_ids[t_id]].add_transition(t)
+                if d is not s:
+                    d.add_transition(t)
+        finally:
+            win.autoflush = autoflush
+        win.flush()
 
         return states
 
+    def edge_groups(self):
+        """
+        Transitions grouped the way they are drawn: one line per (source, destination)
+        pair. Transitions to removed nodes are left out.
+        :return: dict, (source id, dest id) -> sorted list of symbols
+        """
+        edges = {}
+        nodes = self.nodes
+        for k, node in nodes.items():
+            for c, dest in node.transitions.items():
+                if dest in nodes:
+                    edges.setdefault((k, dest), []).append(c)
+        for symbols in edges.values():
+            symbols.sort()
+        return edges
+
+    def place_missing(self, box, method=None):
+        """
+        Gives every node without a center a position (see layout.py).
+        If no node has one, the whole DFA is laid out and fitted into box;
+        otherwise only the new nodes and their neighbours are moved, within box.
+        :param box: (x1, y1, x2, y2) area to lay out in, None for no bound
+        :param method: layout for a complete layout, see layout.LAYOUTS. By default
+                        'force', or 'layered' above layout.FORCE_LIMIT states.
+                        'force' falls back to 'layered' when numpy is not installed
+        """
+        import layout
+        if method is None:
+            method = 'force' if len(self.nodes) <= layout.FORCE_LIMIT else 'layered'
+        missing = [k for k, node in self.nodes.items() if node.center is None]
+        if not missing:
+            return
+        if len(missing) < len(self.nodes):
+            layout.relayout(self, missing, box)
+            return
+        try:
+            layout.layout(self, method, box)
+        except ImportError:  # no numpy
+            layout.layout(self, 'layered', box)
+
     @staticmethod
-    def generate(alphabet, transition_fn, first_state, accept_fn):
+    def generate(alphabet, transition_fn, first_state, accept_fn, cache=None, compact=False):
         """
         Generates a DFA algorithmically
         :param alphabet: list of strings in the alphabet
@@ -144,20 +1045,25 @@ class DFA:
                                 returns new state name
         :param first_state: the initial state (string)
         :param accept_fn: function. takes a state, outputs True if it is an accepting state
+        :param cache: memo.GeneratorCache to route transition_fn and accept_fn through
+        :param compact: build a compact DFA (see NodeTable)
         :return:
         """
+        if cache is not None:
+            transition_fn, accept_fn = cache.wrap(transition_fn, accept_fn)
         # make queue for uninitialized states; add initial
         new_states = deque()
         new_states.append(first_state)
         ready_states = {first_state: 0}
         # make new DFA
-        dfa = DFA()
+        dfa = DFA(compact, alphabet)
         name = 'λ' if len(first_state) == 0 else first_state
-        dfa.nodes[0] = DFANode(name, initial=True, final=accept_fn(first_state), id=0)
+        dfa.add_node(DFANode(name, initial=True, final=accept_fn(first_state), id=0))
         dfa.initial = 0
         # for each state in q:
         while len(new_states) > 0:
             state = new_states.popleft()
+            node = dfa.nodes[ready_states[state]]
             for alpha in alphabet:
                 to_state = transition_fn(state, alpha)
                 if to_state not in ready_states:
@@ -166,15 +1072,389 @@ class DFA:
                     node_id = len(dfa.nodes)
                     name = 'λ' if len(to_state) == 0 else to_state
                     ready_states[to_state] = node_id
-                    new_node = DFANode(name, final=accept_fn(to_state), id=node_id)
-                    dfa.nodes[node_id] = new_node
-                    if accept_fn(to_state):
-                        dfa.final.add(new_node)
+                    final = accept_fn(to_state)
+                    dfa.add_node(DFANode(name, final=final, id=node_id))
+                    if final:
+                        dfa.final.add(dfa.nodes[node_id])
                 # create the transition
-                dfa.nodes[ready_states[state]].add_transition(alpha, ready_states[to_state])
+                node.add_transition(alpha, ready_states[to_state])
         return dfa
 
     @staticmethod
-    def load():
+    def generate_parallel(alphabet, transition_fn, first_state, accept_fn, workers=None, batch_size=512):
+        """
+        Generates the same DFA as generate, expanding each BFS level in batches
+        across a process pool. New states are numbered on this process in
+        frontier order, so ids do not depend on the number of workers.
+        transition_fn and accept_fn must be picklable (module-level functions).
+        :param workers: number of worker processes, None for one per core
+        :param batch_size: states per task; smaller frontiers are expanded here
+        :return: DFA
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        from explore import expand_batch
+
+        alphabet = list(alphabet)
+        dfa = DFA()
+        name = 'λ' if len(first_state) == 0 else first_state
+        dfa.add_node(DFANode(name, initial=True, id=0))
+        dfa.initial = 0
+        ready_states = {first_state: 0}
+        frontier = [first_state]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            while len(frontier) > 0:
+                batches = [(frontier[i:i + batch_size], alphabet, transition_fn, accept_fn)
+                           for i in range(0, len(frontier), batch_size)]
+                if len(batches) == 1:
+                    results = [expand_batch(batches[0])]
+                else:
+                    results = pool.map(expand_batch, batches)
+                next_frontier = []
+                states = iter(frontier)
+                for batch in results:
+                    for final, to_states in batch:
+                        node = dfa.nodes[ready_states[next(states)]]
+                        if final:
+                            node.is_final = True
+                            dfa.final.add(node)
+                        for alpha, to_state in zip(alphabet, to_states):
+                            if to_state not in ready_states:
+                                # trace a new state; final is filled in when it is expanded
+                                next_frontier.append(to_state)
+                                node_id = len(dfa.nodes)
+                                ready_states[to_state] = node_id
+                                name = 'λ' if len(to_state) == 0 else to_state
+                                dfa.add_node(DFANode(name, id=node_id))
+                            node.add_transition(alpha, ready_states[to_state])
+                frontier = next_frontier
+        dfa.invalidate()
+        return dfa
+
+    @staticmethod
+    def load(lazy=False, max_states=1 << 16, cache=None, compact=False):
+        """
+        Builds the DFA defined in generator.py
+        :param lazy: return a LazyDFA that only builds the states simulation reaches
+        :param max_states: LazyDFA cache bound
+        :param cache: memo.GeneratorCache for the generator's functions
+        :param compact: build a compact DFA (see NodeTable)
+        :return: DFA or LazyDFA
+        """
         import generator as g
-        return DFA.generate(g.alphabet, g.transition, g.initial, g.accept)
+        if lazy:
+            transition, accept = g.transition, g.accept
+            if cache is not None:
+                transition, accept = cache.wrap(transition, accept)
+            return LazyDFA(g.alphabet, transition, g.initial, accept, max_states)
+        return DFA.generate(g.alphabet, g.transition, g.initial, g.accept, cache, compact)
+
+
+class LazyDFA:
+    # vars:
+    # alphabet {} - set of symbols
+    # transition_fn, accept_fn - as for DFA.generate
+    # initial - name of the initial state
+    # states OrderedDict - state name -> [final, {symbol: to_state}], least recently used first
+    # max_states - states kept before the least recently used is evicted
+    # materialized - number of times a state was built (rebuilds after eviction included)
+
+    def __init__(self, alphabet, transition_fn, first_state, accept_fn, max_states=1 << 16):
+        """
+        A DFA given by the same functions as DFA.generate, but whose states
+        and transitions are only computed when a simulation reaches them.
+        At most max_states states are held; evicted ones are rebuilt on demand.
+        """
+        self.alphabet = set(alphabet)
+        self.transition_fn = transition_fn
+        self.accept_fn = accept_fn
+        self.initial = first_state
+        self.states = OrderedDict()
+        self.max_states = max(1, max_states)
+        self.materialized = 0
+
+    def __str__(self):
+        return 'LazyDFA holding {0} of at most {1} states'.format(len(self.states), self.max_states)
+
+    def get_state(self, state):
+        # cache entry for state, built if it is not held
+        entry = self.states.get(state)
+        if entry is None:
+            entry = [self.accept_fn(state), {}]
+            self.states[state] = entry
+            self.materialized += 1
+            if len(self.states) > self.max_states:
+                self.states.popitem(last=False)
+        else:
+            self.states.move_to_end(state)
+        return entry
+
+    def step(self, state, char):
+        # state reached from state on char, None if char is not in the alphabet
+        transitions = self.get_state(state)[1]
+        to_state = transitions.get(char)
+        if to_state is None and char in self.alphabet:
+            to_state = transitions[char] = self.transition_fn(state, char)
+        return to_state
+
+    def simulate(self, input_string, debug=False):
+        """
+        Runs input_string, building states as they are first reached.
+        :return: SimulationResult whose state (and trace, a list) hold state names
+        """
+        state = self.initial
+        trace = [state] if debug else None
+        for pos, char in enumerate(input_string):
+            to_state = self.step(state, char)
+            if to_state is None:
+                return SimulationResult(False, state, pos, trace)
+            state = to_state
+            if debug: trace.append(state)
+        return SimulationResult(self.get_state(state)[0], state, -1, trace)
+
+    def accepts(self, input_string):
+        return self.simulate(input_string).accepted
+
+
+# accept predicates for DFA.product: (accepted by self, accepted by other) -> bool
+PRODUCT_MODES = {
+    'union': lambda a, b: a or b,
+    'intersection': lambda a, b: a and b,
+    'difference': lambda a, b: a and not b,
+    'symmetric_difference': lambda a, b: a != b,
+}
+
+
+class SimulationResult:
+    # vars:
+    # accepted - True if the input was accepted
+    # state - id of the state the simulation ended in (or got stuck in), -1 if none
+    #           (for an NFA, the bitset of active states; for a LazyDFA, the state name)
+    # error_pos - index of the character with no transition, -1 if none was missing
+    # trace array('i') - ids of every state visited, None unless requested
+    #                   (for an NFA, a list of active-state bitsets;
+    #                    for a LazyDFA, a list of state names)
+
+    def __init__(self, accepted, state, error_pos=-1, trace=None):
+        self.accepted = accepted
+        self.state = state
+        self.error_pos = error_pos
+        self.trace = trace
+
+    def __bool__(self):
+        return self.accepted
+
+    def __str__(self):
+        if self.error_pos >= 0:
+            return 'simulation error at position {0}'.format(self.error_pos)
+        return 'string accepted' if self.accepted else 'string not accepted'
+
+
+class EquivalenceResult:
+    # vars:
+    # equivalent - True if both DFAs accept the same language
+    # counterexample - shortest string accepted by exactly one of them, None if equivalent
+
+    def __init__(self, equivalent, counterexample=None):
+        self.equivalent = equivalent
+        self.counterexample = counterexample
+
+    def __bool__(self):
+        return self.equivalent
+
+    def __str__(self):
+        if self.equivalent:
+            return 'DFAs are equivalent'
+        return 'DFAs differ on {0!r}'.format(self.counterexample)
+
+
+class CompiledDFA:
+    # vars:
+    # symbols {} - symbol -> column index in the table
+    # ids [] - row index -> DFANode id
+    # width - number of columns (symbols) per row
+    # table array('i') - flat rows*width transition matrix, -1 if no transition
+    # accept bytearray - 1 for each row that is a final state
+    # initial - row of the initial state, -1 if the DFA has none
+    # A compact DFA with no removed rows shares its NodeTable arrays (row == id) rather than
+    # copying them, so the CompiledDFA is only consistent until the DFA is next edited
+
+    def __init__(self, dfa):
+        self.dense = None  # numpy table for simulate_many, built on first use
+        store = dfa.nodes
+        if isinstance(store, NodeTable) and store.is_dense():
+            self.symbols = dict(store.symbols)
+            self.ids = range(len(store))
+            self.width = store.width
+            self.table = store.table
+            self.accept = store.final
+            self.initial = dfa.initial if dfa.initial in store else -1
+            return
+        symbols = set()
+        for node in dfa.nodes.values():
+            symbols.update(node.transitions.keys())
+        self.symbols = {c: i for i, c in enumerate(sorted(symbols))}
+        self.ids = sorted(dfa.nodes.keys())
+        rows = {ident: row for row, ident in enumerate(self.ids)}
+        self.width = len(self.symbols)
+
+        self.table = array('i', [-1]) * (len(self.ids) * self.width)
+        self.accept = bytearray(len(self.ids))
+        for row, ident in enumerate(self.ids):
+            node = dfa.nodes[ident]
+            if node.is_final:
+                self.accept[row] = 1
+            base = row * self.width
+            for c, dest in node.transitions.items():
+                self.table[base + self.symbols[c]] = rows.get(dest, -1)
+        self.initial = rows.get(dfa.initial, -1)
+
+    def __str__(self):
+        return 'CompiledDFA with {0} rows x {1} symbols'.format(len(self.ids), self.width)
+
+    def live_rows(self):
+        """
+        Finds the rows that are both reachable from the initial row and able
+        to reach an accepting row.
+        :return: bytearray, 1 for each live row
+        """
+        rows, width, table = len(self.ids), self.width, self.table
+        reach = bytearray(rows)
+        if self.initial < 0:
+            return reach
+        reach[self.initial] = 1
+        queue = deque([self.initial])
+        preds = [[] for _ in range(rows)]
+        while queue:
+            r = queue.popleft()
+            for t in table[r * width:(r + 1) * width]:
+                if t >= 0:
+                    preds[t].append(r)
+                    if not reach[t]:
+                        reach[t] = 1
+                        queue.append(t)
+        live = bytearray(rows)
+        queue = deque(r for r in range(rows) if reach[r] and self.accept[r])
+        for r in queue:
+            live[r] = 1
+        while queue:
+            t = queue.popleft()
+            for r in preds[t]:
+                if not live[r]:
+                    live[r] = 1
+                    queue.append(r)
+        return live
+
+    def step(self, row, char):
+        # row reached from row on char, -1 if there is no such transition
+        col = self.symbols.get(char)
+        if col is None or row < 0:
+            return -1
+        return self.table[row * self.width + col]
+
+    def simulate(self, input_string, debug=False):
+        table, symbols, width, ids = self.table, self.symbols, self.width, self.ids
+        trace = array('i') if debug else None
+        row = self.initial
+        if row < 0:
+            return SimulationResult(False, -1, 0, trace)
+        if debug: trace.append(ids[row])
+        for pos, char in enumerate(input_string):
+            col = symbols.get(char)
+            next_row = -1 if col is None else table[row * width + col]
+            if next_row < 0:
+                return SimulationResult(False, ids[row], pos, trace)
+            row = next_row
+            if debug: trace.append(ids[row])
+        return SimulationResult(self.accept[row] == 1, ids[row], -1, trace)
+
+    def accepts(self, input_string):
+        table, symbols, width = self.table, self.symbols, self.width
+        row = self.initial
+        if row < 0:
+            return False
+        for char in input_string:
+            col = symbols.get(char)
+            if col is None:
+                return False
+            row = table[row * width + col]
+            if row < 0:
+                return False
+        return self.accept[row] == 1
+
+    def build_dense(self):
+        """
+        Builds the numpy table used by simulate_many.
+        Row len(ids) is a dead state that loops on every column.
+        Column width is padding (every row stays put) and column width+1
+        is any symbol outside the alphabet (every row goes dead).
+        """
+        import numpy as np
+        rows, width = len(self.ids), self.width
+        dead = rows
+        dense = np.empty((rows + 1, width + 2), dtype=np.intp)
+        table = np.frombuffer(self.table, dtype=np.intc).reshape(rows, width)
+        dense[:rows, :width] = np.where(table < 0, dead, table)
+        dense[dead, :width] = dead
+        dense[:, width] = np.arange(rows + 1)
+        dense[:, width + 1] = dead
+        accept = np.zeros(rows + 1, dtype=bool)
+        accept[:rows] = np.frombuffer(bytes(self.accept), dtype=np.uint8) == 1
+        self.dense = (dense, accept)
+        return self.dense
+
+    def simulate_many(self, strings):
+        import numpy as np
+        count = len(strings)
+        if count == 0 or self.initial < 0:
+            return np.zeros(count, dtype=bool)
+        dense, accept = self.dense if self.dense is not None else self.build_dense()
+        pad, unknown = self.width, self.width + 1
+
+        # map every character of the batch to its column in one pass
+        lengths = np.fromiter(map(len, strings), dtype=np.intp, count=count)
+        points = np.frombuffer(''.join(strings).encode('utf-32-le'), dtype=np.uint32)
+        single = [(ord(c), i) for c, i in self.symbols.items() if len(c) == 1]
+        lookup = np.full(max([p for p, _ in single], default=0) + 2, unknown, dtype=np.intp)
+        for p, i in single:
+            lookup[p] = i
+        cols = lookup[np.minimum(points, len(lookup) - 1)]
+
+        # ragged -> padded (position, string) matrix; pad columns are no-ops
+        longest = int(lengths.max())
+        codes = np.full((longest, count), pad, dtype=np.intp)
+        codes.T[np.arange(longest) < lengths[:, None]] = cols
+
+        state = np.full(count, self.initial, dtype=np.intp)
+        for position in range(longest):
+            state = dense[state, codes[position]]
+        return accept[state]
+
+    def scan(self, stream, on_final=None, chunk_size=1 << 16):
+        if hasattr(stream, 'read'):
+            read = stream.read
+            stream = iter(lambda: read(chunk_size), read(0))
+        table, symbols, width, accept = self.table, self.symbols, self.width, self.accept
+        decoder = None
+        row = self.initial
+        offset = 0
+        if row >= 0 and on_final is not None and accept[row]:
+            on_final(offset)
+        for chunk in stream:
+            if row < 0:
+                break  # dead; nothing left to report
+            if isinstance(chunk, (bytes, bytearray, memoryview)):
+                if decoder is None:
+                    # invalid bytes become U+FFFD, which no alphabet holds, so they reject
+                    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+                chunk = decoder.decode(chunk)
+            for char in chunk:
+                col = symbols.get(char)
+                row = -1 if col is None else table[row * width + col]
+                if row < 0:
+                    break
+                offset += 1
+                if on_final is not None and accept[row]:
+                    on_final(offset)
+        if decoder is not None and row >= 0 and decoder.decode(b'', final=True):
+            row = -1  # trailing partial character, decoded as U+FFFD
+        return row >= 0 and accept[row] == 1
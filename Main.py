@@ -10,13 +10,17 @@
 #   Convert NFA to DFA
 #   On two N/DFA inputs: union, intersect, difference, test equivalence
 
+import sys
+
 from DFA import *
+from viewport import Viewport
 
 dfa = None
 
 WIN_HEIGHT = 600
 WIN_WIDTH = 800
 CIR_RADIUS = 20
+VIEWPORT_LIMIT = 2000  # larger machines get a hint that --browse opens them in the read-only zoomable viewport
 
 toolbar_height = 50
 
@@ -68,32 +72,52 @@ def configRightClicks(win):
     win.rightMenu.add_command(label='Set Final', command=lambda: setFinal(win))
     win.rightMenu.add_command(label='Clear Status', command=lambda: clearStatus(win))
     win.rightMenu.add_command(label='Count Nodes', command=lambda: print('node count:', len(states)))
+    win.rightMenu.add_command(label='Summary', command=lambda: print(dfa.summary()))
+    win.rightMenu.add_command(label='Print DFA', command=lambda: dfa.print())
     # win.rightMenu.add_checkbutton(label='check_test', variable=initial, command=lambda: print('check', initial.get()))
 
 
 def setInitial(win):
-    selected_state.node.is_initial = True
-    selected_state.circle.undraw()
-    selected_state.label.undraw()
-    selected_state.draw(win)
+    previous = dfa.set_initial(selected_state.node.id)
+    if previous is not None:  # the old initial state turns back from plum
+        for q in states:
+            if q.node.id == previous:
+                redraw_state(win, q)
+    redraw_state(win, selected_state)
+    report_changes()
 
 
 def setFinal(win):
-    selected_state.node.is_final = True
-    selected_state.circle.undraw()
-    selected_state.label.undraw()
-    selected_state.draw(win)
+    dfa.set_final(selected_state.node.id)
+    redraw_state(win, selected_state)
+    report_changes()
 
 
 def clearStatus(win):
-    selected_state.node.is_initial = selected_state.node.is_final = False
-    selected_state.circle.undraw()
-    selected_state.label.undraw()
-    selected_state.draw(win)
+    dfa.set_initial(selected_state.node.id, False)
+    dfa.set_final(selected_state.node.id, False)
+    redraw_state(win, selected_state)
+    report_changes()
+
+
+def redraw_state(win, q):
+    # redraw q's circle and label after its initial/final status changed
+    q.circle.undraw()
+    q.label.undraw()
+    q.draw(win)
+
+
+def report_changes():
+    # print what the last edit changed, and the new size of the dfa; nothing if the edit changed nothing
+    changes = dfa.pop_changes()
+    if changes:
+        print('\n'.join(changes))
+        print(dfa.summary())
 
 
 def simulate():
-    dfa.simulate(input("Enter input string: "))
+    result = dfa.simulate(input("Enter input string: "))
+    print(result)
 
 
 def switchActiveButton(next_tool, win):
@@ -115,6 +139,7 @@ def switchActiveButton(next_tool, win):
 def main():
     print('yay pflap!')
     from_scratch = False
+    browse = '--browse' in sys.argv[1:]  # read-only zoomable view (see viewport.py) instead of the editor
 
     win = GraphWin('PFLAP', WIN_WIDTH, WIN_HEIGHT, autoflush=False)
     init_window(win)
@@ -126,34 +151,48 @@ def main():
         dfa = DFA()
     else:  # generate dfa
         dfa = DFA.load()
-        global states
-        states = dfa.inflate(win, toolbar_height)
+    print(dfa.summary())
+
+    if browse:
+        dfa.place_missing(None)
+        Viewport(win, dfa, toolbar_height)
+        win.mainloop()
+        return
+    if len(dfa.nodes) > VIEWPORT_LIMIT:
+        print('{0} states; run with --browse to pan and zoom it read-only'.format(len(dfa.nodes)))
 
-    while True:
-        try:
-            clk_pt = win.getMouse()
-        except GraphicsError:  # basically, closed window
-            win.close()
-            break  # aka return aka END OF THE LINE
+    global states
+    states = dfa.inflate(win, toolbar_height)
+    dfa.log_changes()
 
+    def on_click(clk_pt):  # called by Tk for each left click, nothing runs between clicks
         if clk_pt.getY() > toolbar_height:
             processClick(win, clk_pt, active_tool, dfa)
-        dfa.print()
-        print()
+        report_changes()
+
+    win.setMouseHandler(on_click)
+    win.mainloop()  # returns once the window is closed
 
 
-def find_containing_state(clk):
-    # run backwards to preserve expected ordering (top-to-bottom)
-    for q in reversed(states):
-        if q.circle.contains(clk):
+def find_containing_state(win, clk):
+    # the index returns the most recently drawn (top-most) candidates first
+    for q in drawing_of(win).index.query_point(clk.getX(), clk.getY()):
+        if isinstance(q, State) and q.circle.contains(clk):
             return q
     return None
 
 
+def find_containing_transition(win, clk):
+    for t in drawing_of(win).index.query_point(clk.getX(), clk.getY()):
+        if isinstance(t, Transition) and t.contains(clk):
+            return t
+    return None
+
+
 def processClick(win, clk, tool, dfa):
     if tool == 0:  # cursor (edit state/transition)
         global selected_state  # prevent local namespace shadowing
-        q = find_containing_state(clk)
+        q = find_containing_state(win, clk)
         if q is not None:
             if selected_state is not None and selected_state is not q:  # so it doesn't switch b, y, b
                 selected_state.circle.setFill(selected_state.color)
@@ -167,14 +206,14 @@ def processClick(win, clk, tool, dfa):
         new_id = dfa.get_free_id()
         new_node = DFANode("q" + str(new_id), center=clk, id=new_id)
         dfa.add_node(new_node)
-        new_state = State(new_node)  # Can have multiple states w same name!!!!
+        new_state = State(new_node, drawing_of(win))  # Can have multiple states w same name!!!!
         new_state.draw(win)
         states.append(new_state)
 
     elif tool == 2:  # add transition
         global transition_begin_state  # prevent local namespace shadowing
 
-        q = find_containing_state(clk)
+        q = find_containing_state(win, clk)
         if q is not None:
             if transition_begin_state is None:  # first state
                 q.circle.setFill('blue')
@@ -192,7 +231,7 @@ def processClick(win, clk, tool, dfa):
 
                         # Add transition to each state -- used to app ln
                         transition_begin_state.add_transition(trans)
-                        if not q.duplicate(q):
+                        if q is not transition_begin_state:  # self-transitions are listed once
                             q.add_transition(trans)
                 transition_begin_state.circle.setFill(transition_begin_state.color)
                 transition_begin_state = None
@@ -207,24 +246,24 @@ def processClick(win, clk, tool, dfa):
             move_begin_state.move(clk, win)
             move_begin_state = None
             return
-        q = find_containing_state(clk)
+        q = find_containing_state(win, clk)
         if q is not None:
             q.circle.setFill('light blue')
             move_begin_state = q
 
     elif tool == 4:  # remove state or transition
         win.config(cursor="X_cursor")   # Set cursor to a cool "X"
-        for q in reversed(states):  # run backwards to preserve expected ordering (top-to-bottom)
-            for i in range(len(q.transitions)):
-                if q.tcontains(i, clk):
-                    # todo remove transition from node
-                    q.transitions[i].remove()
-                    break
-            if q.circle.contains(clk):
-                dfa.remove_node(q.node)
-                states.remove(q)
-                q.delete()
-                break
+        t = find_containing_transition(win, clk)
+        if t is not None:
+            for c in t.symbols:
+                if t.outState.node.get_transition_on(c) == t.inState.node.id:
+                    t.outState.node.remove_transition(c)
+            t.remove()
+        q = find_containing_state(win, clk)
+        if q is not None:
+            dfa.remove_node(q.node)
+            states.remove(q)
+            q.delete()
 
     # elif tool == 5:  # simulate input
 
@@ -0,0 +1,384 @@
+# NFA classes
+# Maintains a nondeterministic finite automaton and converts it to a DFA
+# State sets are Python ints used as bitsets: bit i is set if row i is in the set
+# Simulation runs on those bitsets directly, so no subset construction is needed
+
+from DFA import *
+
+LAMBDA = 'λ'  # empty-string transition label, as used by Main.py
+CHUNK_BUDGET = 1 << 25  # bytes of successor masks cached per compiled NFA, for step and simulate_many
+
+
+class NFANode:
+
+    def __init__(self, name, center=None, initial=False, final=False, id=-1):
+        self.id = id
+        self.name = name
+        self.transitions = {}  # (character, set of newstates) k/v pairs
+        self.is_final = final
+        self.is_initial = initial
+        self.center = center  # location of representation in GUI
+        self.nfa = None  # NFA this node belongs to, set by NFA.add_node
+
+    def __str__(self):
+        t = ', '.join(sorted(['({0} -> {1})'.format(k, sorted(v)) for k, v in self.transitions.items()]))
+        return '"'+self.name+'" -> '+t+(' final'if self.is_final else'')
+
+    def add_transition(self, char, ident):
+        # add transition on char (or LAMBDA) to state#ident
+        self.transitions.setdefault(char, set()).add(ident)
+        if self.nfa is not None:
+            self.nfa.invalidate()
+
+    def get_transitions_on(self, char):
+        # get the set of destination states, empty if no such transition
+        return self.transitions.get(char, set())
+
+    def getCenter(self):
+        return self.center
+
+
+class NFA:
+    # vars
+    # nodes {} - dict of nodes in this nfa
+    # initial - initial node of the FA
+    # final {} - set of final/accepting nodes in the nfa
+
+    def __init__(self):
+        self.nodes = {}
+        self.initial = None
+        self.final = set()
+        self.ids = IdAllocator()
+        self.compiled = None  # CompiledNFA cache, cleared on any edit
+
+    def __str__(self):
+        return 'NFA containing {0} nodes'.format(len(self.nodes))
+
+    def get_node_by_id(self, ident):
+        return self.nodes.get(ident, None)
+
+    def add_node(self, node):
+        id = node.id
+        if id < 0:
+            id = self.get_free_id()
+            node.id = id
+        if id in self.nodes:
+            return False
+        self.ids.claim(id)
+        self.nodes[id] = node
+        node.nfa = self
+        if node.is_final:
+            self.final.add(node)
+        self.invalidate()
+        return True
+
+    def remove_node(self, node):
+        if node.id in self.nodes:
+            self.nodes.pop(node.id)
+            self.ids.free(node.id)
+            self.final.discard(node)
+            node.nfa = None
+            self.invalidate()
+
+    def get_free_id(self):
+        # an id no node uses, lowest freed id first
+        return self.ids.allocate()
+
+    def invalidate(self):
+        # drop the compiled masks; rebuilt on next compile()
+        self.compiled = None
+
+    def compile(self):
+        """
+        Precomputes the bitset masks used by conversion and simulation.
+        The masks are cached until the NFA is next edited.
+        :return: CompiledNFA
+        """
+        if self.compiled is None:
+            self.compiled = CompiledNFA(self)
+        return self.compiled
+
+    def simulate(self, input_string, debug=False):
+        """
+        Runs input_string through this NFA by tracking the set of active states.
+        :param input_string: string to simulate
+        :param debug: also record the active set after every character
+        :return: SimulationResult whose state is the bitset of active rows
+                (see CompiledNFA.set_name) and whose trace is a list of bitsets
+        """
+        return self.compile().simulate(input_string, debug)
+
+    def accepts(self, input_string):
+        return self.compile().simulate(input_string).accepted
+
+    def simulate_many(self, strings):
+        """
+        Simulates a whole batch of inputs in lockstep. Requires numpy.
+        Large NFAs, whose tables would pass CHUNK_BUDGET, run one string at a time.
+        :param strings: list of input strings
+        :return: numpy bool array, True where the string is accepted
+        """
+        return self.compile().simulate_many(strings)
+
+    def print(self):
+        print('initial state id:', self.initial, ' (name: "'+self.nodes[self.initial].name+'")')
+        for key in self.nodes.keys():
+            print(key, ':', self.nodes[key])
+
+    def to_dfa(self):
+        """
+        Converts this NFA to an equivalent DFA by subset construction.
+        Each DFA state is named after the set of NFA states it stands for.
+        Missing transitions (the empty set) are left out.
+        :return: DFA
+        """
+        nfa = self.compile()
+        dfa = DFA()
+        if nfa.start == 0:
+            return dfa
+
+        new_sets = deque()
+        new_sets.append(nfa.start)
+        ready_sets = {nfa.start: 0}
+        dfa.add_node(DFANode(nfa.set_name(nfa.start), initial=True,
+                             final=nfa.start & nfa.final != 0, id=0))
+        dfa.initial = 0
+        while len(new_sets) > 0:
+            state_set = new_sets.popleft()
+            node = dfa.nodes[ready_sets[state_set]]
+            for alpha in nfa.symbols:
+                to_set = nfa.step(state_set, alpha)
+                if to_set == 0:
+                    continue
+                if to_set not in ready_sets:
+                    # trace a new set, add to DFA
+                    new_sets.append(to_set)
+                    node_id = len(dfa.nodes)
+                    ready_sets[to_set] = node_id
+                    new_node = DFANode(nfa.set_name(to_set), final=to_set & nfa.final != 0, id=node_id)
+                    dfa.add_node(new_node)
+                    if new_node.is_final:
+                        dfa.final.add(new_node)
+                node.add_transition(alpha, ready_sets[to_set])
+        return dfa
+
+
+def bits(mask):
+    # yield the index of every set bit in mask, lowest first
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class CompiledNFA:
+    # vars:
+    # ids [] - bit index -> NFANode id
+    # rows {} - NFANode id -> bit index
+    # symbols [] - sorted alphabet, LAMBDA excluded
+    # closure [] - bit index -> mask of its λ-closure
+    # moves {} - symbol -> list, bit index -> λ-closed mask of successors on symbol
+    # final - mask of final states
+    # start - λ-closed mask of the initial state, 0 if there is none
+    # nbytes - bytes needed to hold a mask
+    # chunks {} - symbol -> list, byte index j -> 256 masks, the successors of every subset
+    #               of rows 8j..8j+7 (see byte_table); filled in as step meets them,
+    #               None where not built yet or past CHUNK_BUDGET
+    # chunk_room - masks chunks may still take before it reaches CHUNK_BUDGET
+
+    def __init__(self, nfa):
+        self.ids = sorted(nfa.nodes.keys())
+        self.rows = {ident: row for row, ident in enumerate(self.ids)}
+        symbols = set()
+        for node in nfa.nodes.values():
+            symbols.update(node.transitions.keys())
+        symbols.discard(LAMBDA)
+        self.symbols = sorted(symbols)
+
+        self.final = 0
+        lambdas = []
+        for row, ident in enumerate(self.ids):
+            node = nfa.nodes[ident]
+            if node.is_final:
+                self.final |= 1 << row
+            lambdas.append(self.mask_of(node.get_transitions_on(LAMBDA)))
+
+        self.closure = [-1] * len(self.ids)
+        for row in range(len(self.ids)):
+            self.close(row, lambdas)
+
+        self.moves = {}
+        for alpha in self.symbols:
+            moves = []
+            for ident in self.ids:
+                direct = self.mask_of(nfa.nodes[ident].get_transitions_on(alpha))
+                moves.append(self.closure_of(direct))
+            self.moves[alpha] = moves
+        row = self.rows.get(nfa.initial, -1)
+        self.start = 0 if row < 0 else self.closure[row]
+        self.nbytes = max(1, (len(self.ids) + 7) // 8)
+        self.chunks = {}
+        self.chunk_room = CHUNK_BUDGET // self.nbytes
+        self.dense = None  # numpy tables for simulate_many, built on first use
+
+    def mask_of(self, idents):
+        mask = 0
+        for ident in idents:
+            row = self.rows.get(ident, -1)
+            if row >= 0:
+                mask |= 1 << row
+        return mask
+
+    def close(self, row, lambdas):
+        # memoized λ-closure of a single row, found by depth-first search
+        if self.closure[row] >= 0:
+            return self.closure[row]
+        seen = 1 << row
+        stack = [row]
+        while stack:
+            r = stack.pop()
+            if self.closure[r] >= 0:
+                seen |= self.closure[r]  # reuse an already closed row
+                continue
+            fresh = lambdas[r] & ~seen
+            seen |= fresh
+            stack.extend(bits(fresh))
+        self.closure[row] = seen
+        return seen
+
+    def closure_of(self, mask):
+        closed = 0
+        for row in bits(mask):
+            closed |= self.closure[row]
+        return closed
+
+    def byte_table(self, char, j):
+        # successors on char of every subset of rows 8j..8j+7, indexed by the subset's byte value
+        moves = self.moves[char]
+        subsets = [0] * 256
+        for v in range(1, 256):
+            low = v & -v
+            row = 8 * j + low.bit_length() - 1
+            subsets[v] = subsets[v ^ low] | (moves[row] if row < len(moves) else 0)
+        return subsets
+
+    def chunk_table(self, char, j):
+        # byte_table(char, j) from chunks, built and kept if the budget allows; None if it is full
+        table = self.chunks.get(char)
+        if table is None:
+            table = self.chunks[char] = [None] * self.nbytes
+        if table[j] is None and self.chunk_room >= 256:
+            table[j] = self.byte_table(char, j)
+            self.chunk_room -= 256
+        return table[j]
+
+    def step(self, mask, char):
+        # λ-closed set reached from mask on char, 0 if none
+        # one table lookup per non-empty byte of mask; once the tables reach CHUNK_BUDGET,
+        # bytes without one OR together the successors of their rows instead
+        moves = self.moves.get(char)
+        if moves is None:
+            return 0
+        table = self.chunks.get(char)
+        if table is None:
+            table = self.chunks[char] = [None] * self.nbytes
+        reached = 0
+        for j, v in enumerate(mask.to_bytes(self.nbytes, 'little')):
+            if v:
+                row = table[j]
+                if row is None:
+                    row = self.chunk_table(char, j)
+                if row is not None:
+                    reached |= row[v]
+                    continue
+                while v:
+                    low = v & -v
+                    reached |= moves[8 * j + low.bit_length() - 1]
+                    v ^= low
+        return reached
+
+    def simulate(self, input_string, debug=False):
+        mask = self.start
+        trace = [mask] if debug else None
+        if mask == 0:
+            return SimulationResult(False, 0, 0, trace)
+        for pos, char in enumerate(input_string):
+            next_mask = self.step(mask, char)
+            if next_mask == 0:
+                return SimulationResult(False, mask, pos, trace)
+            mask = next_mask
+            if debug: trace.append(mask)
+        return SimulationResult(mask & self.final != 0, mask, -1, trace)
+
+    def build_dense(self):
+        """
+        Builds the numpy tables used by simulate_many: one 256-entry table per
+        (column, mask byte), each entry a mask stored as uint64 words.
+        Column len(symbols) is padding (the mask is kept as it is) and
+        column len(symbols)+1 is any symbol outside the alphabet (empty set).
+        """
+        import numpy as np
+        width = len(self.symbols)
+        words = (self.nbytes + 7) // 8
+        nbytes = words * 8  # bytes per mask once padded to whole words
+        dense = np.zeros((width + 2, nbytes, 256, words), dtype='<u8')
+
+        def fill(column, j, masks):
+            raw = b''.join(m.to_bytes(nbytes, 'little') for m in masks)
+            dense[column, j] = np.frombuffer(raw, dtype='<u8').reshape(256, words)
+
+        for column, alpha in enumerate(self.symbols):
+            for j in range(self.nbytes):
+                fill(column, j, self.chunk_table(alpha, j) or self.byte_table(alpha, j))
+        for j in range(nbytes):
+            fill(width, j, [v << (8 * j) for v in range(256)])
+        final = np.frombuffer(self.final.to_bytes(nbytes, 'little'), dtype='<u8')
+        start = np.frombuffer(self.start.to_bytes(nbytes, 'little'), dtype='<u8')
+        self.dense = (dense, final, start)
+        return self.dense
+
+    def dense_size(self):
+        # bytes build_dense would allocate
+        nbytes = (self.nbytes + 7) // 8 * 8
+        return (len(self.symbols) + 2) * nbytes * 256 * nbytes
+
+    def simulate_many(self, strings):
+        import numpy as np
+        count = len(strings)
+        if count == 0 or self.start == 0:
+            return np.zeros(count, dtype=bool)
+        if self.dense is None and self.dense_size() > CHUNK_BUDGET:
+            # the tables grow with the square of the number of states; run each string on its own
+            return np.fromiter((self.simulate(s).accepted for s in strings), dtype=bool, count=count)
+        dense, final, start = self.dense if self.dense is not None else self.build_dense()
+        width = len(self.symbols)
+        pad, unknown = width, width + 1
+        nbytes = dense.shape[1]
+
+        # map every character of the batch to its column in one pass
+        columns = {alpha: i for i, alpha in enumerate(self.symbols)}
+        lengths = np.fromiter(map(len, strings), dtype=np.intp, count=count)
+        points = np.frombuffer(''.join(strings).encode('utf-32-le'), dtype=np.uint32)
+        single = [(ord(c), i) for c, i in columns.items() if len(c) == 1]
+        lookup = np.full(max([p for p, _ in single], default=0) + 2, unknown, dtype=np.intp)
+        for p, i in single:
+            lookup[p] = i
+        cols = lookup[np.minimum(points, len(lookup) - 1)]
+
+        # ragged -> padded (position, string) matrix; pad columns are no-ops
+        longest = int(lengths.max())
+        codes = np.full((longest, count), pad, dtype=np.intp)
+        codes.T[np.arange(longest) < lengths[:, None]] = cols
+
+        state = np.tile(start, (count, 1))
+        for position in range(longest):
+            col = codes[position]
+            mask_bytes = state.view(np.uint8)
+            reached = dense[col, 0, mask_bytes[:, 0]]
+            for j in range(1, nbytes):
+                reached |= dense[col, j, mask_bytes[:, j]]
+            state = reached
+        return (state & final).any(axis=1)
+
+    def set_name(self, mask):
+        return '{' + ','.join(str(self.ids[row]) for row in bits(mask)) + '}'
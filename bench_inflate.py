@@ -0,0 +1,42 @@
+# Inflate benchmark
+# Times DFA.inflate on random machines of increasing size; needs a display
+# usage: python bench_inflate.py [sizes...]     (default 100 1000 10000)
+
+import random
+import sys
+import time
+
+from DFA import *
+
+
+def random_dfa(num_states, alphabet='ab', seed=0):
+    # every state gets a transition on every symbol to a random state; about a quarter are final
+    rng = random.Random(seed)
+    dfa = DFA()
+    for i in range(num_states):
+        dfa.add_node(DFANode('q' + str(i), initial=(i == 0), final=rng.random() < .25, id=i))
+    for node in dfa.nodes.values():
+        for c in alphabet:
+            node.add_transition(c, rng.randrange(num_states))
+        if node.is_final:
+            dfa.final.add(node)
+    dfa.initial = 0
+    return dfa
+
+
+def main(sizes):
+    for n in sizes:
+        dfa = random_dfa(n)
+        win = GraphWin('inflate benchmark: {0} states'.format(n), 800, 600, autoflush=False)
+        start = time.perf_counter()
+        dfa.place_missing((60, 60, 740, 540))  # layout is timed on its own, see layout.py
+        placed = time.perf_counter()
+        dfa.inflate(win, 0)
+        elapsed = time.perf_counter() - placed
+        print('{0:>6} states: layout {1:8.3f} s, inflate {2:8.3f} s  ({3} canvas items)'.format(
+            n, placed - start, elapsed, len(win.find_all())))
+        win.close()
+
+
+if __name__ == '__main__':
+    main([int(n) for n in sys.argv[1:]] or [100, 1000, 10000])
@@ -4,19 +4,44 @@
 
 from graphics import *
 from math import *
-CIR_RADIUS = 20
+from spatial import GridIndex, segment_distance
+import geometry
+from geometry import CIR_RADIUS
+CLICK_TOLERANCE = 4  # how far from a transition line a click still hits it
+
+
+class Drawing:
+    # States and Transitions drawn in one window (see drawing_of)
+    # vars:
+    # index - GridIndex of every drawn State and Transition
+    # edges {} - (source State, destination State) -> Transition;
+    #            kept up to date by State.add_transition/remove_transition
+
+    def __init__(self):
+        self.index = GridIndex()
+        self.edges = {}
+
+
+# The Drawing of win, created on first use
+def drawing_of(win):
+    drawing = getattr(win, 'drawing', None)
+    if drawing is None:
+        drawing = win.drawing = Drawing()
+    return drawing
 
 
 class State:
     # vars:
     # node - DFANode this State is based on
+    # drawing - Drawing of the window this State is drawn in
     # circle - Circle object in the canvas
     # color - Color of state based on if initial or final
     # transitions [] - Transitions with this state as source or destination
     # label - Text object in the canvas
 
-    def __init__(self, node):
+    def __init__(self, node, drawing):
         self.node = node
+        self.drawing = drawing
         self.circle = Circle(node.center, CIR_RADIUS)
         self.label = Text(node.center, node.name)
         self.color = ""
@@ -44,13 +69,28 @@ class State:
         self.circle.setFill(self.color)
         self.circle.draw(win)
         self.label.draw(win)
+        self.drawing.index.update(self, self.bbox())
+
+    # Bounding box of the state circle
+    def bbox(self):
+        x, y = self.getCenter().getX(), self.getCenter().getY()
+        return (x - CIR_RADIUS, y - CIR_RADIUS, x + CIR_RADIUS, y + CIR_RADIUS)
 
     # Draw state and transition(s)
     def drawAll(self, win):
         self.draw(win)
-        # Update transitions
+        self.redraw_transitions(win)
+
+    # Redraw every transition of this state; a pair of opposite transitions is drawn together, once
+    def redraw_transitions(self, win):
+        drawn = set()
         for line in self.transitions:
-            line.draw(win)
+            if line not in drawn:
+                line.draw(win)
+                drawn.add(line)
+                reverse = self.drawing.edges.get((line.inState, line.outState))
+                if reverse is not None:
+                    drawn.add(reverse)
 
     # Print information about the state
     def print(self):
@@ -62,11 +102,15 @@ class State:
     # Add transition to state's transition list
     def add_transition(self, line):
         self.transitions.append(line)
+        self.drawing.edges[line.outState, line.inState] = line
 
     # Remove transition from state's transition list
     def remove_transition(self, line):
         if line in self.transitions:
             self.transitions.remove(line)
+        key = (line.outState, line.inState)
+        if self.drawing.edges.get(key) is line:
+            del self.drawing.edges[key]
 
     # Returns center of state circle
     def getCenter(self):
@@ -74,12 +118,7 @@ class State:
 
     # If transition line was clicked
     def tcontains(self, index, click):
-        if self.transitions[index].rect.contains(click):
-            return True
-        if self.transitions[index].inState.equal(self.transitions[index].outState):
-            return self.point_in_triangle(click, self.transitions[index].line.getPoints())
-        first, second = self.transitions[index].line.getP1(), self.transitions[index].line.getP2()
-        return first.distanceTo(click) + second.distanceTo(click) == first.distanceTo(second)
+        return self.transitions[index].contains(click)
 
     # Returns if point is in self-transition triangle
     def point_in_triangle(self, click, list_of_points):
@@ -93,19 +132,13 @@ class State:
         return (p1.getX() - p3.getX()) * (p2.getY() - p3.getY()) - \
                (p2.getX() - p3.getX()) * (p1.getY() - p3.getY())
 
-    # Checks if the transition exists
+    # Checks if a transition from this state to inState exists
     def duplicate(self, inState):
-        for t in self.transitions:
-            if t.inState == inState:
-                return True
-        return False
+        return (self, inState) in self.drawing.edges
 
     # If transition exists, add new symbols
     def check_existing(self, inState, symbols, win):
-        trans = None
-        for t in self.transitions:
-            if t.inState == inState and t.outState == self:
-                trans = t
+        trans = self.drawing.edges.get((self, inState))
         if trans is None:
             return False
         trans.add_symbol(symbols, win)
@@ -113,102 +146,46 @@ class State:
 
     # If reverse transition exists, redraw transitions
     def check_reverse(self, inState, symbols, win):
-        trans_out = None
         # Find the reverse transition
-        for t in inState.transitions:
-            if t.inState == self and t.outState == inState:
-                trans_out = t
+        trans_out = self.drawing.edges.get((inState, self))
         if trans_out is None:
             return False
 
-        # Find new points to draw transition line
-        if self.find_degree(inState):
-            top_in = self.find_edge(Point(self.getCenter().getX() - 5, self.getCenter().getY()),
-                                    Point(inState.getCenter().getX() - 5, inState.getCenter().getY()))
-            top_out = inState.find_edge(Point(inState.getCenter().getX() - 5, inState.getCenter().getY()),
-                                        Point(self.getCenter().getX() - 5, self.getCenter().getY()))
-
-            bottom_out = self.find_edge(Point(self.getCenter().getX() + 5, self.getCenter().getY()),
-                                        Point(inState.getCenter().getX() + 5, inState.getCenter().getY()))
-            bottom_in = inState.find_edge(Point(inState.getCenter().getX() + 5, inState.getCenter().getY()),
-                                          Point(self.getCenter().getX() + 5, self.getCenter().getY()))
-        else:
-            top_in = self.find_edge(Point(self.getCenter().getX(), self.getCenter().getY() - 5),
-                                        Point(inState.getCenter().getX(), inState.getCenter().getY() - 5))
-            top_out = inState.find_edge(Point(inState.getCenter().getX(), inState.getCenter().getY() - 5),
-                                    Point(self.getCenter().getX(), self.getCenter().getY() - 5))
-
-            bottom_out = self.find_edge(Point(self.getCenter().getX(), self.getCenter().getY() + 5),
-                                          Point(inState.getCenter().getX(), inState.getCenter().getY() + 5))
-            bottom_in = inState.find_edge(Point(inState.getCenter().getX(), inState.getCenter().getY() + 5),
-                                    Point(self.getCenter().getX(), self.getCenter().getY() + 5))
+        forward, backward = self.parallel_points(inState)
 
         # Redraw trans going out
         trans_out.undraw()
-        trans_out.line = Line(top_in, top_out)
-        trans_out.line.setArrow("last")
-        trans_out.line.draw(win)
-        s = ", ".join(trans_out.symbols)
-        point = Point(trans_out.line.getCenter().getX(), trans_out.line.getCenter().getY() - 10)
-        trans_out.text = Text(point, s)
-        trans_out.text.draw(win)
-
-        length = len(trans_out.symbols) * 3 // 2
-        first = Point(point.getX() - length, point.getY() - 4)
-        second = Point(point.getX() + length, point.getY() + 4)
-        trans_out.rect = Rectangle(first, second)
+        trans_out.draw_line(win, *backward, above=True)
 
         # Draw transition going in
-        trans_in = None
-        new = False
-        for t in self.transitions:
-            if t.inState == inState:
-                trans_in = t
-                trans_in.undraw()
-        if trans_in is None:
+        trans_in = self.drawing.edges.get((self, inState))
+        new = trans_in is None
+        if new:
             trans_in = Transition(self, inState, symbols)
-            new = True
-
-        trans_in.line = Line(bottom_in, bottom_out)
-        trans_in.line.setArrow("last")
-        trans_in.line.draw(win)
-        s = ", ".join(trans_in.symbols)
-        point = Point(trans_in.line.getCenter().getX(), trans_in.line.getCenter().getY() + 10)
-        trans_in.text = Text(point, s)
-        trans_in.text.draw(win)
-        trans_in.above = False
-
-        length = len(trans_in.symbols) * 3 // 2
-        first = Point(point.getX() - length, point.getY() - 4)
-        second = Point(point.getX() + length, point.getY() + 4)
-        trans_in.rect = Rectangle(first, second)
+        elif trans_in.line is not None:
+            trans_in.undraw()
+        trans_in.draw_line(win, *forward, above=False)
 
         if new:
             self.add_transition(trans_in)
             inState.add_transition(trans_in)
+        trans_out.reindex()
+        trans_in.reindex()
         return True
 
+    # End points for a pair of opposite transitions, offset to either side of the center line
+    # Returns ((start, end) of self -> other, (start, end) of other -> self)
+    def parallel_points(self, other):
+        forward, backward = geometry.parallel_points(xy(self.getCenter()), xy(other.getCenter()))
+        return tuple(Point(*p) for p in forward), tuple(Point(*p) for p in backward)
+
     # Find the edge of the state in relation to another
     def find_edge(self, other, this):
-        dx = other.getX() - this.getX()
-        dy = other.getY() - this.getY()
-        rads = atan2(dy, dx)
-        rads %= (2 * pi)
-        X = this.getX() + (CIR_RADIUS * math.cos(rads))
-        Y = this.getY() + (CIR_RADIUS * math.sin(rads))
-        return Point(X, Y)
+        return Point(*geometry.edge_point(xy(this), xy(other)))
 
     # Returns if transition has more vertical or horizontal alignment
     def find_degree(self, other):
-        dx = other.circle.getCenter().getX() - self.circle.getCenter().getX()
-        dy = other.circle.getCenter().getY() - self.circle.getCenter().getY()
-        rads = atan2(dy, dx)
-        rads %= (2 * pi)
-        deg = degrees(rads)
-        print("deg:", deg)
-        if 60 < deg < 120 or 240 < deg < 300:
-            return True
-        return False
+        return geometry.is_steep(xy(self.circle.getCenter()), xy(other.circle.getCenter()))
 
     # Move transition
     def move(self, location, win):
@@ -217,16 +194,17 @@ class State:
         self.circle.move(dx, dy)
         self.label.move(dx, dy)
         self.node.center = location
+        self.drawing.index.update(self, self.bbox())
 
         # Update transitions
-        for line in self.transitions:
-            line.draw(win)
+        self.redraw_transitions(win)
 
         # Set color back from light blue
         self.circle.setFill(self.color)
 
     # Delete state and all of its transitions
     def delete(self):
+        self.drawing.index.remove(self)
         self.circle.undraw()
         self.color = ""
         self.label.undraw()
@@ -293,6 +271,35 @@ class Transition:
         first = Point(point.getX() - length, point.getY() - 4)
         second = Point(point.getX() + length, point.getY() + 4)
         self.rect = Rectangle(first, second)
+        self.reindex()
+
+    # If the transition (label, line or self-transition triangle) was clicked
+    def contains(self, click):
+        if self.rect is not None and self.rect.contains(click):
+            return True
+        if self.line is None:
+            return False
+        if self.inState == self.outState:
+            return self.outState.point_in_triangle(click, self.line.getPoints())
+        return segment_distance(click, self.line.getP1(), self.line.getP2()) <= CLICK_TOLERANCE
+
+    # Bounding box of line and label, widened by the click tolerance
+    def bbox(self):
+        if isinstance(self.line, Polygon):
+            points = self.line.getPoints()
+        else:
+            points = [self.line.getP1(), self.line.getP2()]
+        if self.rect is not None:
+            points += [self.rect.getP1(), self.rect.getP2()]
+        xs = [p.getX() for p in points]
+        ys = [p.getY() for p in points]
+        return (min(xs) - CLICK_TOLERANCE, min(ys) - CLICK_TOLERANCE,
+                max(xs) + CLICK_TOLERANCE, max(ys) + CLICK_TOLERANCE)
+
+    # Bring this transition's entry in its Drawing's index up to date
+    def reindex(self):
+        if self.line is not None:
+            self.outState.drawing.index.update(self, self.bbox())
 
 
     # Draw
@@ -306,24 +313,30 @@ class Transition:
             self.self_transition(win)
         else:
             if not self.outState.check_reverse(self.inState, self.symbols, win):
-                line_first = self.movePoints(self.firstCenter(), self.secondCenter())
-                line_second = self.movePoints(self.secondCenter(), self.firstCenter())
-                self.line = Line(line_first, line_second)
-                self.line.setArrow("last")
-                self.line.draw(win)
-
-                s = ", ".join(self.symbols)
-                if self.above:
-                    point = Point(self.line.getCenter().getX(), self.line.getCenter().getY() - 10)
-                else:
-                    point = Point(self.line.getCenter().getX(), self.line.getCenter().getY() + 10)
-                self.text = Text(point, s)
-                self.text.draw(win)
-
-                length = len(self.symbols) * 3 // 2
-                first = Point(point.getX() - length, point.getY() - 4)
-                second = Point(point.getX() + length, point.getY() + 4)
-                self.rect = Rectangle(first, second)
+                self.draw_line(win, *self.straight_points(), above=self.above)
+        self.reindex()
+
+    # End points of a transition line with no reverse transition
+    def straight_points(self):
+        return (self.movePoints(self.firstCenter(), self.secondCenter()),
+                self.movePoints(self.secondCenter(), self.firstCenter()))
+
+    # Draw the line from start to end with the symbols above or below its middle
+    def draw_line(self, win, start, end, above=True):
+        self.line = Line(start, end)
+        self.line.setArrow("last")
+        self.line.draw(win)
+        self.above = above
+
+        point = geometry.label_point(xy(start), xy(end), above)
+        self.text = Text(Point(*point), ", ".join(self.symbols))
+        self.text.draw(win)
+        self.set_label_box(point)
+
+    # Hit box around the label at point
+    def set_label_box(self, point):
+        x1, y1, x2, y2 = geometry.label_box(point, self.symbols)
+        self.rect = Rectangle(Point(x1, y1), Point(x2, y2))
 
     # Erase transition from the window
     def undraw(self):
@@ -334,41 +347,30 @@ class Transition:
 
     # Deletes transition completely
     def remove(self):
+        self.outState.drawing.index.remove(self)
         self.undraw()
         self.outState.remove_transition(self)
         self.inState.remove_transition(self)
 
     # Takes two points and returns a point that is distance t from first point
     def movePoints(self, first, second):
-        if first.x == second.x and first.y == second.y:
-            return first
-        d = math.sqrt(((second.getX() - first.getX()) ** 2) +
-                      ((second.getY() - first.getY()) ** 2))
-        t = (CIR_RADIUS - .1) / d
-        point = Point((((1 - t) * (first.getX())) + (t * second.getX())),
-                      (((1 - t) * (first.getY())) + (t * second.getY())))
-        return point
+        return Point(*geometry.trim(xy(first), xy(second)))
 
     # Draws the self transition
     def self_transition(self, win):
-        top = Point(self.inState.node.center.getX(), self.inState.node.center.getY() - CIR_RADIUS)
-        left = Point(top.getX() - CIR_RADIUS, top.getY() - CIR_RADIUS)
-        right = Point(left.getX() + (2 * CIR_RADIUS), left.getY())
-        self.line = Polygon(top, left, right)
+        triangle, head, point = geometry.self_loop(xy(self.inState.node.center))
+        self.line = Polygon(*[Point(*p) for p in triangle])
         self.line.draw(win)
 
-        l_left = Point(top.getX() + (CIR_RADIUS / 4), top.getY() - (CIR_RADIUS / 2.2))
-        l_right = Point(top.getX() + (CIR_RADIUS / 2.2), top.getY() - (CIR_RADIUS / 4))
-        self.arrow = Polygon(top, l_left, l_right)
+        self.arrow = Polygon(*[Point(*p) for p in head])
         self.arrow.setFill("black")
         self.arrow.draw(win)
 
-        s = ", ".join(self.symbols)
-        point = Point(top.getX(), top.getY() - CIR_RADIUS - 5)
-        self.text = Text(point, s)
+        self.text = Text(Point(*point), ", ".join(self.symbols))
         self.text.draw(win)
+        self.set_label_box(point)
 
-        length = len(self.symbols) * 3 // 2
-        first = Point(point.getX() - length, point.getY() - 4)
-        second = Point(point.getX() + length, point.getY() + 4)
-        self.rect = Rectangle(first, second)
+
+# (x, y) tuple of a Point, for geometry.py
+def xy(point):
+    return point.getX(), point.getY()
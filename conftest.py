@@ -0,0 +1,28 @@
+# Shared pytest fixtures
+
+import pytest
+
+from DFA import DFA, DFANode
+
+
+def make_ring(states, final=(0,), reset=None, compact=False):
+    """
+    DFA of states in a ring on 'a', starting at state 0.
+    :param final: ids of the final states
+    :param reset: symbol that takes every state back to 0, None for none
+    :param compact: build a compact DFA (see NodeTable)
+    """
+    dfa = DFA(compact=compact)
+    for i in range(states):
+        node = DFANode('q' + str(i), id=i, initial=(i == 0), final=(i in final))
+        node.add_transition('a', (i + 1) % states)
+        if reset is not None:
+            node.add_transition(reset, 0)
+        dfa.add_node(node)
+    dfa.initial = 0
+    return dfa
+
+
+@pytest.fixture
+def ring():
+    return make_ring
@@ -0,0 +1,207 @@
+# Binary DFA files
+# Saves a DFA as a flat binary file and opens it again with the transition
+# matrix memory-mapped, so large machines load without reading every row
+#
+# Layout (little-endian), sections in this order:
+#   header      magic, version, flags, rows, width, initial (see HEADER)
+#   symbols     per symbol: uint16 byte length + UTF-8 bytes
+#   transitions int32[rows * width], -1 for no transition, 8-byte aligned
+#   final       bitmap, one bit per row (bit i of byte i // 8)
+#   initial     bitmap
+#   live        bitmap, rows that hold a node (ids freed by remove_node are not live)
+#   names       (flag NAMES) uint32 offsets[rows + 1] then the UTF-8 names back to back
+#   layout      (flag LAYOUT) float64 xs[rows] then ys[rows], nan if unset, 8-byte aligned
+# Rows are node ids, so ids survive the round trip.
+
+import mmap
+import os
+import struct
+from array import array
+
+from DFA import *
+
+MAGIC = b'PFLAPDFA'
+VERSION = 1
+HEADER = struct.Struct('<8sHHIIi')
+NAMES = 1
+LAYOUT = 2
+
+# byte -> the 8 per-row flags it packs, for unpacking bitmaps
+_UNPACK = [bytes((b >> i) & 1 for i in range(8)) for b in range(256)]
+
+
+def pack_bits(flags):
+    packed = bytearray((len(flags) + 7) // 8)
+    for i, flag in enumerate(flags):
+        if flag:
+            packed[i >> 3] |= 1 << (i & 7)
+    return bytes(packed)
+
+
+def unpack_bits(packed, rows):
+    return bytearray(b''.join(_UNPACK[b] for b in packed)[:rows])
+
+
+def padding(offset):
+    return -offset % 8
+
+
+class PackedNames:
+    # Node names read straight from a mapped names section; renamed rows and
+    # rows added after loading are kept in overrides.
+    # A file saved without names gets the default 'q<id>' names
+
+    def __init__(self, buffer, offsets, rows):
+        self.buffer = buffer
+        self.offsets = offsets
+        self.rows = rows
+        self.overrides = {}
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, ident):
+        if ident in self.overrides:
+            return self.overrides[ident]
+        if not 0 <= ident < self.rows:
+            raise IndexError(ident)
+        if self.buffer is None:
+            return 'q' + str(ident)
+        return str(self.buffer[self.offsets[ident]:self.offsets[ident + 1]], 'utf-8')
+
+    def __setitem__(self, ident, name):
+        self.overrides[ident] = name
+
+    def extend(self, names):
+        for name in names:
+            self.overrides[self.rows] = name
+            self.rows += 1
+
+
+def save(dfa, path, names=True, layout=True):
+    """
+    Writes dfa to path in the binary format above.
+    :param dfa: DFA, compact or not
+    :param path: file name
+    :param names: include state names
+    :param layout: include state positions, if any state has one
+    """
+    store = dfa.nodes
+    compact = isinstance(store, NodeTable)
+    if compact:
+        rows, symbols = len(store.live), sorted(store.symbols, key=store.symbols.get)
+    else:
+        rows = max(store.keys(), default=-1) + 1
+        symbols = sorted({c for node in store.values() for c in node.transitions})
+    width = len(symbols)
+    columns = {c: i for i, c in enumerate(symbols)}
+
+    if compact:
+        table = store.table
+        final, initial, live = store.final, store.initial, store.live
+    else:
+        table = array('i', [-1]) * (rows * width)
+        final, initial, live = bytearray(rows), bytearray(rows), bytearray(rows)
+        for ident, node in store.items():
+            live[ident] = 1
+            final[ident] = 1 if node.is_final else 0
+            initial[ident] = 1 if node.is_initial else 0
+            for c, dest in node.transitions.items():
+                table[ident * width + columns[c]] = dest
+
+    flags = 0
+    if names:
+        flags |= NAMES
+        names = [store[ident].name if live[ident] else '' for ident in range(rows)]
+    if layout:
+        centers = [store[ident].center if live[ident] else None for ident in range(rows)]
+        if any(center is not None for center in centers):
+            flags |= LAYOUT
+
+    # write to a temporary file first: path may still be memory-mapped by load, and
+    # truncating a mapped file would pull the rows out from under it
+    temp = path + '.tmp'
+    with open(temp, 'wb') as f:
+        start = dfa.initial if dfa.initial in store else -1
+        f.write(HEADER.pack(MAGIC, VERSION, flags, rows, width, start))
+        for c in symbols:
+            encoded = c.encode('utf-8')
+            f.write(struct.pack('<H', len(encoded)))
+            f.write(encoded)
+        f.write(bytes(padding(f.tell())))
+        f.write(bytes(table) if isinstance(table, memoryview) else table.tobytes())
+        for flag_row in (final, initial, live):
+            f.write(pack_bits(flag_row))
+
+        if flags & NAMES:
+            encoded = [name.encode('utf-8') for name in names]
+            offsets = array('I', [0])
+            for name in encoded:
+                offsets.append(offsets[-1] + len(name))
+            f.write(offsets.tobytes())
+            f.write(b''.join(encoded))
+
+        if flags & LAYOUT:
+            f.write(bytes(padding(f.tell())))
+            nan = float('nan')
+            f.write(array('d', [c.getX() if c is not None else nan for c in centers]).tobytes())
+            f.write(array('d', [c.getY() if c is not None else nan for c in centers]).tobytes())
+    os.replace(temp, path)
+
+
+def load(path):
+    """
+    Opens a DFA saved by save. The file is memory-mapped copy-on-write: the
+    transition matrix and names are read from the mapping only when rows are
+    used, and edits stay in memory and never reach the file.
+    :param path: file name
+    :return: compact DFA (see NodeTable)
+    """
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    magic, version, flags, rows, width, initial = HEADER.unpack_from(mm, 0)
+    if magic != MAGIC:
+        raise ValueError('{0} is not a PFLAP DFA file'.format(path))
+    if version != VERSION:
+        raise ValueError('unsupported PFLAP DFA file version {0}'.format(version))
+    offset = HEADER.size
+    symbols = []
+    for _ in range(width):
+        length, = struct.unpack_from('<H', mm, offset)
+        symbols.append(str(mm[offset + 2:offset + 2 + length], 'utf-8'))
+        offset += 2 + length
+    offset += padding(offset)
+
+    view = memoryview(mm)
+    dfa = DFA(compact=True, alphabet=symbols)
+    store = dfa.nodes
+    store.table = view[offset:offset + 4 * rows * width].cast('i')
+    offset += 4 * rows * width
+    bitmap = (rows + 7) // 8
+    store.final = unpack_bits(mm[offset:offset + bitmap], rows)
+    store.initial = unpack_bits(mm[offset + bitmap:offset + 2 * bitmap], rows)
+    store.live = unpack_bits(mm[offset + 2 * bitmap:offset + 3 * bitmap], rows)
+    store.count = store.live.count(1)
+    offset += 3 * bitmap
+
+    if flags & NAMES:
+        offsets = view[offset:offset + 4 * (rows + 1)].cast('I')
+        offset += 4 * (rows + 1)
+        store.names = PackedNames(view[offset:offset + offsets[rows]], offsets, rows)
+        offset += offsets[rows]
+    else:
+        store.names = PackedNames(None, None, rows)
+
+    if flags & LAYOUT:
+        offset += padding(offset)
+        store.xs = view[offset:offset + 8 * rows].cast('d')
+        store.ys = view[offset + 8 * rows:offset + 16 * rows].cast('d')
+
+    dfa.initial = initial if initial >= 0 else None
+    ident = store.final.find(1)
+    while ident >= 0:
+        dfa.final.add(store[ident])
+        ident = store.final.find(1, ident + 1)
+    free = [ident for ident in range(rows) if not store.live[ident]] if store.count < rows else ()
+    dfa.ids = IdAllocator(rows, free)
+    return dfa
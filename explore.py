@@ -0,0 +1,13 @@
+# State-space exploration helpers
+# Kept free of graphics imports so process-pool workers can load it cheaply
+
+
+def expand_batch(batch):
+    """
+    Expands one batch of a DFA.generate_parallel frontier.
+    :param batch: (states, alphabet, transition_fn, accept_fn)
+    :return: list, per state: (accepting?, [new state for each symbol in alphabet])
+    """
+    states, alphabet, transition_fn, accept_fn = batch
+    return [(accept_fn(state), [transition_fn(state, alpha) for alpha in alphabet])
+            for state in states]
@@ -0,0 +1,74 @@
+# Geometry
+# Where the parts of a drawn state or transition go, as plain (x, y) tuples
+# Shared by the Tk objects in classState.py and the off-screen renderer in render.py
+
+from math import atan2, cos, sin, degrees, pi, sqrt
+
+CIR_RADIUS = 20
+LABEL_OFFSET = 10  # distance of a transition's label above or below the middle of its line
+
+
+def edge_point(center, toward, radius=CIR_RADIUS):
+    # point on the circle around center in the direction of toward
+    rads = atan2(toward[1] - center[1], toward[0] - center[0]) % (2 * pi)
+    return center[0] + radius * cos(rads), center[1] + radius * sin(rads)
+
+
+def trim(first, second, radius=CIR_RADIUS):
+    # point just inside the circle around first, on the way to second
+    if first[0] == second[0] and first[1] == second[1]:
+        return first
+    d = sqrt((second[0] - first[0]) ** 2 + (second[1] - first[1]) ** 2)
+    t = (radius - .1) / d
+    return (1 - t) * first[0] + t * second[0], (1 - t) * first[1] + t * second[1]
+
+
+def is_steep(a, b):
+    # whether the line from a to b is closer to vertical than horizontal (within 30 degrees)
+    deg = degrees(atan2(b[1] - a[1], b[0] - a[0]) % (2 * pi))
+    return 60 < deg < 120 or 240 < deg < 300
+
+
+def straight_points(a, b):
+    # (start, end) of a transition from the state at a to the state at b, with no reverse transition
+    return trim(a, b), trim(b, a)
+
+
+def parallel_points(a, b):
+    """
+    End points for a pair of opposite transitions between the states at a
+    and b, offset to either side of the line between their centers.
+    :return: ((start, end) of a -> b, (start, end) of b -> a)
+    """
+    dx, dy = (5, 0) if is_steep(a, b) else (0, 5)
+    a_plus, b_plus = (a[0] + dx, a[1] + dy), (b[0] + dx, b[1] + dy)
+    a_minus, b_minus = (a[0] - dx, a[1] - dy), (b[0] - dx, b[1] - dy)
+    forward = (edge_point(a_plus, b_plus), edge_point(b_plus, a_plus))
+    backward = (edge_point(b_minus, a_minus), edge_point(a_minus, b_minus))
+    return forward, backward
+
+
+def label_point(start, end, above=True):
+    # where the symbols of a transition line go
+    offset = -LABEL_OFFSET if above else LABEL_OFFSET
+    return (start[0] + end[0]) / 2, (start[1] + end[1]) / 2 + offset
+
+
+def label_box(point, symbols):
+    # (x1, y1, x2, y2) hit box around a transition label
+    length = len(symbols) * 3 // 2
+    return point[0] - length, point[1] - 4, point[0] + length, point[1] + 4
+
+
+def self_loop(center):
+    """
+    Shapes of a transition from the state at center to itself: a triangle
+    resting on top of the circle, and a small filled arrow head at its tip.
+    :return: (triangle points, arrow head points, label point)
+    """
+    top = (center[0], center[1] - CIR_RADIUS)
+    left = (top[0] - CIR_RADIUS, top[1] - CIR_RADIUS)
+    right = (left[0] + 2 * CIR_RADIUS, left[1])
+    head = (top, (top[0] + CIR_RADIUS / 4, top[1] - CIR_RADIUS / 2.2),
+            (top[0] + CIR_RADIUS / 2.2, top[1] - CIR_RADIUS / 4))
+    return (top, left, right), head, (top[0], top[1] - CIR_RADIUS - 5)
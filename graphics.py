@@ -163,11 +163,17 @@ UNSUPPORTED_METHOD = "Object doesn't support operation"
 BAD_OPTION = "Illegal option value"
 DEAD_THREAD = "Graphics thread quit unexpectedly"
 
-_root = tk.Tk()
-_root.withdraw()
+_root = None  # hidden Tk root, created with the first window so importing needs no display
+
+def _tk_root():
+    global _root
+    if _root is None:
+        _root = tk.Tk()
+        _root.withdraw()
+    return _root
 
 def update():
-    _root.update()
+    _tk_root().update()
 
 ############################################################################
 # Graphics classes start here
@@ -178,7 +184,7 @@ class GraphWin(tk.Canvas):
 
     def __init__(self, title="Graphics Window",
                  width=200, height=200, autoflush=True):
-        master = tk.Toplevel(_root)
+        master = tk.Toplevel(_tk_root())
         master.protocol("WM_DELETE_WINDOW", self.close)
         tk.Canvas.__init__(self, master, width=width, height=height)
         self.master.title(title)
@@ -233,6 +239,7 @@ class GraphWin(tk.Canvas):
         if self.closed: return
         self.closed = True
         self.master.destroy()
+        _root.quit()  # end mainloop(), if the window was running one
         self.__autoflush()
 
     def isClosed(self):
@@ -316,13 +323,20 @@ class GraphWin(tk.Canvas):
             return x,y
 
     def setMouseHandler(self, func):
+        """Call func(Point) on every left click, in world coordinates"""
         self._mouseCallback = func
 
+    def mainloop(self, n=0):
+        """Process events until the window is closed, waking only when
+        Tk has an event to deliver (see setMouseHandler)"""
+        self.__checkOpen()
+        _root.mainloop(n)
+
     def _onClick(self, e):
         self.mouseX = e.x
         self.mouseY = e.y
         if self._mouseCallback:
-            self._mouseCallback(Point(e.x, e.y))
+            self._mouseCallback(Point(*self.toWorld(e.x, e.y)))
 
     def _onRightClick(self, e):
         self.rightMenu.post(e.x_root, e.y_root)
@@ -699,7 +713,7 @@ class Entry(GraphicsObject):
         self.anchor = p.clone()
         #print self.anchor
         self.width = width
-        self.text = tk.StringVar(_root)
+        self.text = tk.StringVar(_tk_root())
         self.text.set("")
         self.fill = "gray"
         self.color = "black"
@@ -790,10 +804,10 @@ class Image(GraphicsObject):
         self.imageId = Image.idCount
         Image.idCount = Image.idCount + 1
         if len(pixmap) == 1: # file name provided
-            self.img = tk.PhotoImage(file=pixmap[0], master=_root)
+            self.img = tk.PhotoImage(file=pixmap[0], master=_tk_root())
         else: # width and height provided
             width, height = pixmap
-            self.img = tk.PhotoImage(master=_root, width=width, height=height)
+            self.img = tk.PhotoImage(master=_tk_root(), width=width, height=height)
                 
     def _draw(self, canvas, options):
         p = self.anchor
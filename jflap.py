@@ -0,0 +1,134 @@
+# JFLAP interop
+# Reads and writes JFLAP .jff finite automaton files
+# Files are parsed incrementally, so large files load without building the whole XML tree
+
+import os
+from xml.etree.ElementTree import iterparse
+from xml.sax.saxutils import escape, quoteattr
+
+from NFA import *
+
+
+def read_jff(path):
+    """
+    Reads a JFLAP finite automaton. State positions are kept in node.center,
+    so inflate draws the saved layout.
+    :param path: .jff file name
+    :return: DFA if the automaton is deterministic (no λ and at most one
+            transition per state and symbol), otherwise NFA
+    """
+    states = []  # (id, name, x, y, initial, final)
+    transitions = {}  # from id -> {symbol: [to ids]}
+    deterministic = True
+    machine_type = None
+    open_elems = []  # elements started but not ended; the last one holds the element just ended
+    for event, elem in iterparse(path, events=('start', 'end')):
+        if event == 'start':
+            open_elems.append(elem)
+            continue
+        open_elems.pop()
+        tag = elem.tag
+        if tag == 'type':
+            machine_type = (elem.text or '').strip()
+            if machine_type != 'fa':
+                raise ValueError('{0} holds a "{1}" automaton, not a finite automaton'.format(path, machine_type))
+        elif tag == 'state':
+            x, y = elem.findtext('x'), elem.findtext('y')
+            states.append((int(elem.get('id')), elem.get('name') or 'q' + elem.get('id'),
+                           float(x) if x is not None else None, float(y) if y is not None else None,
+                           elem.find('initial') is not None, elem.find('final') is not None))
+        elif tag == 'transition':
+            read = elem.findtext('read') or LAMBDA
+            out = transitions.setdefault(int(elem.findtext('from')), {})
+            to = out.setdefault(read, [])
+            to.append(int(elem.findtext('to')))
+            if read == LAMBDA or len(to) > 1:
+                deterministic = False
+        else:
+            continue
+        # empty the enclosing <automaton> (or <structure>, in older files) once a state or transition is read
+        if open_elems:
+            open_elems[-1].clear()
+
+    machine = DFA() if deterministic else NFA()
+    node_type = DFANode if deterministic else NFANode
+    for ident, name, x, y, initial, final in states:
+        center = Point(x, y) if x is not None and y is not None else None
+        node = node_type(name, center=center, initial=initial, final=final, id=ident)
+        machine.add_node(node)
+        if initial and machine.initial is None:
+            machine.initial = ident
+        if final and deterministic:
+            machine.final.add(node)
+    for ident, out in transitions.items():
+        node = machine.nodes[ident]
+        for read, to in out.items():
+            for dest in to:
+                node.add_transition(read, dest)
+    return machine
+
+
+def write_jff(machine, path):
+    """
+    Writes a DFA or NFA as a JFLAP finite automaton, streaming one element at a time.
+    States without a position are placed on a grid.
+    :param machine: DFA or NFA
+    :param path: .jff file name
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8" standalone="no"?>'
+                '<!--Created with PFLAP-->\n<structure>\n\t<type>fa</type>\n\t<automaton>\n')
+        for i, (ident, node) in enumerate(machine.nodes.items()):
+            center = node.center
+            x, y = (center.getX(), center.getY()) if center is not None else (60 + 80 * (i % 20), 60 + 80 * (i // 20))
+            f.write('\t\t<state id="{0}" name={1}>\n\t\t\t<x>{2}</x>\n\t\t\t<y>{3}</y>\n'.format(
+                ident, quoteattr(node.name), float(x), float(y)))
+            if ident == machine.initial:
+                f.write('\t\t\t<initial/>\n')
+            if node.is_final:
+                f.write('\t\t\t<final/>\n')
+            f.write('\t\t</state>\n')
+        for ident, node in machine.nodes.items():
+            for read, to in node.transitions.items():
+                for dest in (sorted(to) if isinstance(to, set) else [to]):
+                    label = '<read/>' if read == LAMBDA else '<read>{0}</read>'.format(escape(read))
+                    f.write('\t\t<transition>\n\t\t\t<from>{0}</from>\n\t\t\t<to>{1}</to>\n\t\t\t{2}\n'
+                            '\t\t</transition>\n'.format(ident, dest, label))
+        f.write('\t</automaton>\n</structure>\n')
+
+
+def convert_file(paths):
+    """
+    Converts one file between .jff and the binary .dfa format (see dfafile.py),
+    by extension. Nondeterministic .jff automata are converted to DFAs first.
+    :param paths: (source file, destination file)
+    :return: destination file
+    """
+    source, dest = paths
+    if source.endswith('.jff'):
+        machine = read_jff(source)
+        if isinstance(machine, NFA):
+            machine = machine.to_dfa()
+        machine.save(dest)
+    else:
+        write_jff(DFA.open(source), dest)
+    return dest
+
+
+def convert_directory(source_dir, dest_dir, workers=None):
+    """
+    Converts every .jff file in source_dir to .dfa, and every .dfa file to .jff,
+    across a process pool.
+    :param workers: number of worker processes, None for one per core
+    :return: list of files written
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    os.makedirs(dest_dir, exist_ok=True)
+    jobs = []
+    for name in sorted(os.listdir(source_dir)):
+        stem, ext = os.path.splitext(name)
+        if ext in ('.jff', '.dfa'):
+            other = '.dfa' if ext == '.jff' else '.jff'
+            jobs.append((os.path.join(source_dir, name), os.path.join(dest_dir, stem + other)))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(convert_file, jobs))
@@ -0,0 +1,294 @@
+# Layout
+# Positions the states of a DFA for drawing by writing each node's center
+# Layouts are looked up by name in LAYOUTS:
+#   grid     states in id order on a grid
+#   layered  breadth-first layers from the initial state, one column per layer
+#   force    force-directed, grid-accelerated and vectorized with numpy (requires numpy)
+
+import math
+from collections import deque
+
+from classState import CIR_RADIUS, Point
+
+SPACING = 3 * CIR_RADIUS  # preferred distance between neighbouring states
+FORCE_LIMIT = 10000  # DFA.place_missing uses the layered layout for larger machines
+FAR_CELLS = 24  # grid size per side for the far-field approximation in force_layout
+
+
+def layout(dfa, method='force', box=None, **options):
+    """
+    Lays out every state of dfa, replacing any earlier centers.
+    :param method: name of a layout in LAYOUTS
+    :param box: (x1, y1, x2, y2) to fit the drawing into. The layout is only
+                ever shrunk to fit, never stretched; None places it at the origin
+    :param options: passed on to the layout function
+    """
+    ids, xs, ys = LAYOUTS[method](dfa, **options)
+    place(dfa, ids, xs, ys, box)
+
+
+def relayout(dfa, new_ids, box=None, iterations=40, spacing=SPACING):
+    """
+    Incremental layout after a few states were added. New states start next
+    to the neighbours they are connected to, then only they and their direct
+    neighbours are moved by a short force-directed run, so the rest of the
+    drawing stays where the user has seen it. Without numpy the new states
+    just keep their starting spots.
+    :param new_ids: ids of the states without a center
+    :param box: (x1, y1, x2, y2) the moved states are kept inside, None for no bound
+    """
+    new_ids = set(new_ids)
+    incoming = dfa.reverse_index()
+    movable = set(new_ids)
+    for ident in new_ids:
+        movable.update(dest for dest in dfa.nodes[ident].transitions.values() if dest in dfa.nodes)
+        movable.update(src for src, c in incoming.get(ident, ()))
+    for ident in sorted(new_ids):
+        node = dfa.nodes[ident]
+        placed = [dfa.nodes[other].center for other in neighbours(dfa, ident, incoming)
+                  if dfa.nodes[other].center is not None]
+        if placed:
+            x = sum(c.getX() for c in placed) / len(placed)
+            y = sum(c.getY() for c in placed) / len(placed)
+        elif box is not None:
+            x, y = (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+        else:
+            x, y = 0.0, 0.0
+        # spread the new states around their anchor so they never start on top of each other
+        angle = ident * 2.39996  # golden angle
+        node.center = Point(x + spacing * math.cos(angle), y + spacing * math.sin(angle))
+    try:
+        ids, xs, ys = force_layout(dfa, iterations, spacing, movable=movable, temperature=spacing)
+    except ImportError:  # no numpy
+        ids = sorted(new_ids)
+        xs = [dfa.nodes[i].center.getX() for i in ids]
+        ys = [dfa.nodes[i].center.getY() for i in ids]
+    if box is not None:
+        x1, y1, x2, y2 = box
+        xs = [min(max(x, x1), x2) for x in xs]
+        ys = [min(max(y, y1), y2) for y in ys]
+    place(dfa, ids, xs, ys)
+
+
+def neighbours(dfa, ident, incoming):
+    # ids joined to state#ident by a transition either way
+    out = [dest for dest in dfa.nodes[ident].transitions.values() if dest in dfa.nodes]
+    return out + [src for src, c in incoming.get(ident, ())]
+
+
+def place(dfa, ids, xs, ys, box=None):
+    # write positions to node centers, shrunk and centered into box if given
+    if box is not None and len(ids):
+        x1, y1, x2, y2 = box
+        low_x, high_x, low_y, high_y = min(xs), max(xs), min(ys), max(ys)
+        scale = min(1.0, (x2 - x1) / max(high_x - low_x, 1e-9), (y2 - y1) / max(high_y - low_y, 1e-9))
+        dx = (x1 + x2) / 2 - scale * (low_x + high_x) / 2
+        dy = (y1 + y2) / 2 - scale * (low_y + high_y) / 2
+        xs = [dx + scale * x for x in xs]
+        ys = [dy + scale * y for y in ys]
+    nodes = dfa.nodes
+    for ident, x, y in zip(ids, xs, ys):
+        nodes[ident].center = Point(float(x), float(y))
+
+
+def grid_layout(dfa, spacing=SPACING, aspect_ratio=4 / 3):
+    """
+    States in id order, row by row, on a grid about aspect_ratio times as
+    wide as it is tall; odd columns are shifted down a quarter row.
+    :return: (ids, xs, ys)
+    """
+    ids = list(dfa.nodes.keys())
+    wide = max(1, math.ceil(math.sqrt(len(ids) * aspect_ratio)))
+    xs = [spacing * (i % wide) for i in range(len(ids))]
+    ys = [spacing * (i // wide) + (i % 2) * spacing / 4 for i in range(len(ids))]
+    return ids, xs, ys
+
+
+def layered_layout(dfa, spacing=SPACING):
+    """
+    Breadth-first layers from the initial state (then from each state not
+    reached yet, in id order), one column per layer, each column centered.
+    Linear in the size of the DFA.
+    :return: (ids, xs, ys)
+    """
+    nodes = dfa.nodes
+    layer_of = {}
+    layers = []
+    roots = [dfa.initial] if dfa.initial in nodes else []
+    for root in roots + list(nodes.keys()):
+        if root in layer_of:
+            continue
+        layer_of[root] = 0
+        queue = deque([root])
+        while queue:
+            ident = queue.popleft()
+            layer = layer_of[ident]
+            if layer == len(layers):
+                layers.append([])
+            layers[layer].append(ident)
+            for dest in nodes[ident].transitions.values():
+                if dest not in layer_of and dest in nodes:
+                    layer_of[dest] = layer + 1
+                    queue.append(dest)
+    ids, xs, ys = [], [], []
+    for column, members in enumerate(layers):
+        middle = (len(members) - 1) / 2
+        for row, ident in enumerate(members):
+            ids.append(ident)
+            xs.append(2 * spacing * column)
+            ys.append(spacing * (row - middle))
+    return ids, xs, ys
+
+
+def force_layout(dfa, iterations=100, spacing=SPACING, movable=None, temperature=None, seed=0):
+    """
+    Fruchterman-Reingold force-directed layout. Repulsion is only computed
+    between states in the same or neighbouring cells of a grid of
+    2 * spacing, so each iteration is roughly linear in the number of states.
+    Starts from the current centers if every state has one, otherwise from a
+    square grid filled in breadth-first order, so joined states start close. Requires numpy.
+    :param iterations: number of steps; the step size cools linearly to zero
+    :param spacing: preferred distance between joined states
+    :param movable: ids allowed to move, None for all
+    :param temperature: largest first step, default a tenth of the drawing's width
+    :return: (ids, xs, ys) of the states that could move
+    """
+    import numpy as np
+    nodes = dfa.nodes
+    if all(node.center is not None for node in nodes.values()):
+        ids = list(nodes.keys())
+        pos = np.array([(nodes[i].center.getX(), nodes[i].center.getY()) for i in ids], dtype=float)
+    else:
+        ids = layered_layout(dfa, spacing)[0]
+        wide = max(1, math.ceil(math.sqrt(len(ids))))
+        rows = np.arange(len(ids))
+        pos = np.column_stack((rows % wide, rows // wide)).astype(float) * spacing
+    n = len(ids)
+    if n < 2:
+        return ids, list(pos[:, 0]), list(pos[:, 1])
+    row_of = {ident: row for row, ident in enumerate(ids)}
+
+    # undirected edges without self-transitions or repeats
+    edge_set = {(min(row_of[a], row_of[b]), max(row_of[a], row_of[b]))
+                for a in ids for b in nodes[a].transitions.values() if b in row_of and b != a}
+    edges = np.array(sorted(edge_set), dtype=np.int64).reshape(-1, 2)
+
+    if movable is None:
+        active = np.arange(n)
+    else:
+        active = np.array(sorted(row_of[i] for i in movable if i in row_of), dtype=np.int64)
+    if not len(active):
+        return ids, list(pos[:, 0]), list(pos[:, 1])
+    frozen = np.ones(n, dtype=bool)
+    frozen[active] = False
+    pos[active] += np.random.default_rng(seed).uniform(-spacing / 10, spacing / 10, (len(active), 2))
+
+    k = float(spacing)
+    cell = 2 * k
+    if temperature is None:
+        temperature = max(np.ptp(pos[:, 0]), np.ptp(pos[:, 1]), k) / 10
+    far_cells = min(FAR_CELLS, int(math.sqrt(n) / 4))
+    for step in range(iterations):
+        disp = repulsion(pos, active, cell, k)
+        disp += far_repulsion(pos, k, far_cells)
+        if len(edges):
+            delta = pos[edges[:, 0]] - pos[edges[:, 1]]
+            dist = np.maximum(np.hypot(delta[:, 0], delta[:, 1]), 1e-9)
+            pull = delta * (dist / k)[:, None]  # |d|^2 / k along d
+            for axis in (0, 1):
+                disp[:, axis] -= np.bincount(edges[:, 0], pull[:, axis], n)
+                disp[:, axis] += np.bincount(edges[:, 1], pull[:, axis], n)
+        disp[frozen] = 0
+        length = np.maximum(np.hypot(disp[:, 0], disp[:, 1]), 1e-9)
+        limit = temperature * (1 - step / iterations)
+        pos += disp * (np.minimum(length, limit) / length)[:, None]
+    ids = [ids[row] for row in active]
+    return ids, list(pos[active, 0]), list(pos[active, 1])
+
+
+def repulsion(pos, active, cell, k):
+    """
+    Sum of the repulsive forces k^2 / d on each active row, from every row
+    closer than cell, found through a grid of cell-sized squares.
+    When every row is active each pair is visited once and pushes both ways.
+    :return: (n, 2) array, zero for inactive rows
+    """
+    import numpy as np
+    n = len(pos)
+    grid = np.floor(pos / cell).astype(np.int64)
+    grid -= grid.min(axis=0) - 1  # keep every neighbouring cell index positive
+    height = int(grid[:, 1].max()) + 2
+    keys = grid[:, 0] * height + grid[:, 1]
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    xs, ys = pos[order, 0], pos[order, 1]
+    cells, starts, counts = np.unique(keys, return_index=True, return_counts=True)
+    symmetric = len(active) == n
+    if symmetric:
+        sources = np.arange(n)  # rows in sorted order
+        offsets = [(0, 0), (0, 1), (1, -1), (1, 0), (1, 1)]
+    else:
+        rank = np.empty(n, dtype=np.int64)
+        rank[order] = np.arange(n)
+        sources = rank[active]
+        offsets = [(ox, oy) for ox in (-1, 0, 1) for oy in (-1, 0, 1)]
+
+    fx, fy = np.zeros(n), np.zeros(n)
+    for ox, oy in offsets:
+        wanted = keys[sources] + ox * height + oy
+        at = np.minimum(np.searchsorted(cells, wanted), len(cells) - 1)
+        found = cells[at] == wanted
+        i, at = sources[found], at[found]
+        repeat = counts[at]
+        total = int(repeat.sum())
+        if not total:
+            continue
+        i = np.repeat(i, repeat)
+        j = np.repeat(starts[at] - np.cumsum(repeat) + repeat, repeat) + np.arange(total)
+        if symmetric and ox == 0 and oy == 0:
+            keep = i < j  # each pair within a cell once
+            i, j = i[keep], j[keep]
+        dx, dy = xs[i] - xs[j], ys[i] - ys[j]
+        d2 = np.maximum(dx * dx + dy * dy, 1e-9)
+        weight = np.where(d2 < cell * cell, (k * k) / d2, 0.0)  # k^2 / |d| along d
+        dx *= weight
+        dy *= weight
+        fx += np.bincount(i, dx, n)
+        fy += np.bincount(i, dy, n)
+        if symmetric:
+            fx -= np.bincount(j, dx, n)
+            fy -= np.bincount(j, dy, n)
+    disp = np.zeros((n, 2))
+    disp[order, 0] = fx
+    disp[order, 1] = fy
+    return disp
+
+
+def far_repulsion(pos, k, cells):
+    """
+    Approximate repulsion from states further away: states are gathered into
+    a cells x cells grid over the drawing, and every state is pushed by the
+    other occupied grid cells as if each were one state of its total weight at
+    its centroid (the state's own grid cell is left to repulsion()).
+    :return: (n, 2) array
+    """
+    import numpy as np
+    if cells < 2:
+        return np.zeros(pos.shape)
+    low = pos.min(axis=0)
+    size = max(np.ptp(pos[:, 0]), np.ptp(pos[:, 1]), 1e-9) / cells * (1 + 1e-9)
+    grid = np.floor((pos - low) / size).astype(np.int64)
+    keys, inverse, counts = np.unique(grid[:, 0] * cells + grid[:, 1], return_inverse=True, return_counts=True)
+    inverse = inverse.reshape(-1)
+    cx = np.bincount(inverse, pos[:, 0]) / counts
+    cy = np.bincount(inverse, pos[:, 1]) / counts
+    dx = cx[:, None] - cx[None, :]
+    dy = cy[:, None] - cy[None, :]
+    d2 = dx * dx + dy * dy
+    np.fill_diagonal(d2, np.inf)
+    weight = counts[None, :] * (k * k) / np.maximum(d2, k * k)  # k^2 / |d| along d, per state
+    push = np.column_stack(((dx * weight).sum(axis=1), (dy * weight).sum(axis=1)))
+    return push[inverse]
+
+
+LAYOUTS = {'grid': grid_layout, 'layered': layered_layout, 'force': force_layout}
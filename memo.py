@@ -0,0 +1,154 @@
+# Generator memoization
+# Caches the results of the transition and accept functions used by DFA.generate,
+# optionally on disk, so regenerating a machine reuses earlier calls
+
+import hashlib
+import os
+import pickle
+import types
+from collections import OrderedDict
+
+
+class GeneratorCache:
+    # vars:
+    # transitions OrderedDict - (function key, state, symbol) -> new state, least recently used first
+    # accepts OrderedDict - (function key, state) -> bool, least recently used first
+    # max_entries - entries kept per table before the least recently used is evicted, None for no bound
+    # path - pickle file the cache is loaded from and saved to, None to keep it in memory
+    # hits, misses - lookups answered from the cache / passed on to the function
+
+    def __init__(self, max_entries=None, path=None):
+        """
+        Results are keyed on the function (see function_key) as well as its
+        arguments, so one cache file can serve several generators, and
+        editing a function or a module global it reads starts it on fresh
+        entries while unchanged functions keep theirs.
+        """
+        self.transitions = OrderedDict()
+        self.accepts = OrderedDict()
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def __str__(self):
+        total = self.hits + self.misses
+        rate = 100 * self.hits / total if total else 0
+        return 'GeneratorCache: {0} hits, {1} misses ({2:.1f}% hit rate), {3} entries'.format(
+            self.hits, self.misses, rate, len(self.transitions) + len(self.accepts))
+
+    def lookup(self, table, key, compute):
+        if key in table:
+            self.hits += 1
+            table.move_to_end(key)
+            return table[key]
+        self.misses += 1
+        value = table[key] = compute()
+        if self.max_entries is not None and len(table) > self.max_entries:
+            table.popitem(last=False)
+        return value
+
+    def wrap(self, transition_fn, accept_fn):
+        """
+        Wraps a generator's functions so each call goes through the cache.
+        :return: (memoized transition_fn, memoized accept_fn)
+        """
+        t_name = function_key(transition_fn)
+        a_name = function_key(accept_fn)
+
+        def transition(state, symbol):
+            return self.lookup(self.transitions, (t_name, state, symbol),
+                               lambda: transition_fn(state, symbol))
+
+        def accept(state):
+            return self.lookup(self.accepts, (a_name, state), lambda: accept_fn(state))
+
+        return transition, accept
+
+    def clear(self):
+        self.transitions.clear()
+        self.accepts.clear()
+
+    def load(self):
+        with open(self.path, 'rb') as f:
+            transitions, accepts = pickle.load(f)
+        self.transitions.update(transitions)
+        self.accepts.update(accepts)
+
+    def save(self):
+        # write to a temporary file first so an interrupted save keeps the old cache
+        if self.path is None:
+            return
+        temp = self.path + '.tmp'
+        with open(temp, 'wb') as f:
+            pickle.dump((self.transitions, self.accepts), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp, self.path)
+
+
+def function_name(fn):
+    return '{0}.{1}'.format(getattr(fn, '__module__', ''), getattr(fn, '__qualname__', repr(fn)))
+
+
+def function_key(fn):
+    # cache key for fn: its name plus a fingerprint of its code and the globals it reads
+    return '{0}#{1}'.format(function_name(fn), fingerprint(fn))
+
+
+def fingerprint(fn, seen=None):
+    """
+    Hash of what fn computes with: its bytecode and constants (nested
+    functions included), default arguments, closure values and the module
+    globals it names. Global functions are fingerprinted in turn; modules
+    and other values that cannot be pickled count by name only.
+    """
+    code = getattr(fn, '__code__', None)
+    if code is None:  # builtins and other callables without bytecode
+        return ''
+    if seen is None:
+        seen = set()
+    seen.add(fn)
+    h = hashlib.sha1()
+    codes = [code]
+    while codes:
+        c = codes.pop()
+        h.update(c.co_code)
+        for const in c.co_consts:
+            if isinstance(const, types.CodeType):
+                codes.append(const)
+            else:
+                h.update(value_fingerprint(const, seen))
+        h.update(' '.join(c.co_names).encode('utf-8'))
+        for name in c.co_names:
+            if name in fn.__globals__:
+                h.update(name.encode('utf-8'))
+                h.update(value_fingerprint(fn.__globals__[name], seen))
+    h.update(value_fingerprint(fn.__defaults__, seen))
+    for cell in fn.__closure__ or ():
+        try:
+            h.update(value_fingerprint(cell.cell_contents, seen))
+        except ValueError:  # cell not filled yet
+            pass
+    return h.hexdigest()[:16]
+
+
+def value_fingerprint(value, seen):
+    # bytes standing for a constant, global, default or closure value in a fingerprint
+    if isinstance(value, types.FunctionType):
+        return b'' if value in seen else fingerprint(value, seen).encode('ascii')
+    if isinstance(value, (set, frozenset)):  # pickled in hash order, which changes between runs
+        return b'set' + joined(sorted(value_fingerprint(v, seen) for v in value))
+    if isinstance(value, (tuple, list)):  # may hold sets
+        return type(value).__name__.encode('ascii') + joined(value_fingerprint(v, seen) for v in value)
+    if isinstance(value, (types.ModuleType, type)) or callable(value):
+        return repr(getattr(value, '__name__', type(value).__name__)).encode('utf-8')
+    try:
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return repr(type(value)).encode('utf-8')
+
+
+def joined(parts):
+    # parts concatenated, each behind its length so different splits never collide
+    return b''.join(len(part).to_bytes(4, 'little') + part for part in parts)
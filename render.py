@@ -0,0 +1,199 @@
+# Off-screen rendering
+# Draws a DFA straight to an SVG or PNG file, without Tk or a display
+# Shapes come from geometry.py, so the files look like the editor's canvas
+
+import math
+import os
+
+from xml.sax.saxutils import escape
+
+import geometry
+from DFA import *
+
+MARGIN = 2 * geometry.CIR_RADIUS + 15  # room around the outer states for self-transitions and their labels
+FONT_SIZE = 12
+ARROW_LENGTH = 10  # arrow heads on transition lines, as Tk draws them
+ARROW_WIDTH = 3
+
+
+def render(dfa, path, scale=1.0):
+    """
+    Writes a diagram of dfa to path, as SVG or PNG by extension.
+    States without a center are laid out first (see DFA.place_missing).
+    :param scale: size of the image relative to DFA coordinates
+    """
+    dfa.place_missing(None)
+    if path.lower().endswith('.png'):
+        write_png(dfa, path, scale)
+    else:
+        write_svg(dfa, path, scale)
+
+
+def shapes(dfa, ids=None, edges=None):
+    """
+    Everything to draw for dfa, transitions first so states cover their
+    ends, in DFA coordinates. Opposite transitions are offset the way inflate
+    draws them.
+    :param ids: states to draw, None for all
+    :param edges: transitions to draw, as returned by DFA.edge_groups; None for all
+    Yields tuples:
+        ('line', start, end)            arrow head at end
+        ('polygon', points, filled)
+        ('circle', center, fill color, outline width)
+        ('text', point, string)
+    """
+    nodes = dfa.nodes
+    if edges is None:
+        edges = dfa.edge_groups()
+    centers = {}
+    for src, dest in edges:
+        for k in (src, dest):
+            if k not in centers:
+                center = nodes[k].center
+                centers[k] = (center.getX(), center.getY())
+    for (src, dest), symbols in edges.items():
+        label = ', '.join(symbols)
+        if src == dest:
+            triangle, head, point = geometry.self_loop(centers[src])
+            yield 'polygon', triangle, False
+            yield 'polygon', head, True
+            yield 'text', point, label
+            continue
+        if (dest, src) not in edges:
+            (start, end), above = geometry.straight_points(centers[src], centers[dest]), True
+        elif src < dest:
+            (start, end), above = geometry.parallel_points(centers[src], centers[dest])[0], False
+        else:
+            (start, end), above = geometry.parallel_points(centers[dest], centers[src])[1], True
+        yield 'line', start, end
+        yield 'text', geometry.label_point(start, end, above), label
+    for k in (nodes.keys() if ids is None else ids):
+        node = nodes[k]
+        center = (node.center.getX(), node.center.getY())
+        yield 'circle', center, 'plum' if node.is_initial else 'yellow', 3 if node.is_final else 1
+        yield 'text', center, node.name
+
+
+def bounds(dfa):
+    # (x, y) of the top left corner and (width, height) of the drawing, margin included
+    xs = [node.center.getX() for node in dfa.nodes.values()] or [0.0]
+    ys = [node.center.getY() for node in dfa.nodes.values()] or [0.0]
+    return (min(xs) - MARGIN, min(ys) - MARGIN), (max(xs) - min(xs) + 2 * MARGIN, max(ys) - min(ys) + 2 * MARGIN)
+
+
+def write_svg(dfa, out, scale=1.0):
+    """
+    Streams an SVG diagram of dfa, one element per shape.
+    :param out: file name, or a text file object to write to
+    """
+    if isinstance(out, str):
+        with open(out, 'w', encoding='utf-8') as f:
+            return write_svg(dfa, f, scale)
+    (left, top), (width, height) = bounds(dfa)
+    write = out.write
+    write('<svg xmlns="http://www.w3.org/2000/svg" width="{0:.0f}" height="{1:.0f}" '
+          'viewBox="{2:.1f} {3:.1f} {4:.1f} {5:.1f}">\n'.format(width * scale, height * scale, left, top, width, height))
+    write('<defs><marker id="arrow" viewBox="0 0 {0} {1}" refX="{0}" refY="{2}" markerWidth="{0}" '
+          'markerHeight="{1}" markerUnits="userSpaceOnUse" orient="auto"><path d="M0,0L{0},{2}L0,{1}z"/>'
+          '</marker></defs>\n'.format(ARROW_LENGTH, 2 * ARROW_WIDTH, ARROW_WIDTH))
+    write('<rect x="{0:.1f}" y="{1:.1f}" width="{2:.1f}" height="{3:.1f}" fill="white"/>\n'.format(left, top, width, height))
+    write('<g stroke="black" font-family="helvetica" font-size="{0}" text-anchor="middle" '
+          'dominant-baseline="central">\n'.format(FONT_SIZE))
+    for shape in shapes(dfa):
+        kind = shape[0]
+        if kind == 'line':
+            (x1, y1), (x2, y2) = shape[1], shape[2]
+            write('<line x1="{0:.1f}" y1="{1:.1f}" x2="{2:.1f}" y2="{3:.1f}" marker-end="url(#arrow)"/>\n'.format(
+                x1, y1, x2, y2))
+        elif kind == 'polygon':
+            points = ' '.join('{0:.1f},{1:.1f}'.format(x, y) for x, y in shape[1])
+            write('<polygon points="{0}" fill="{1}"/>\n'.format(points, 'black' if shape[2] else 'none'))
+        elif kind == 'circle':
+            (x, y), fill, stroke = shape[1], shape[2], shape[3]
+            write('<circle cx="{0:.1f}" cy="{1:.1f}" r="{2}" fill="{3}" stroke-width="{4}"/>\n'.format(
+                x, y, geometry.CIR_RADIUS, fill, stroke))
+        else:
+            (x, y), text = shape[1], shape[2]
+            write('<text x="{0:.1f}" y="{1:.1f}" stroke="none">{2}</text>\n'.format(x, y, escape(text)))
+    write('</g>\n</svg>\n')
+
+
+def write_png(dfa, path, scale=1.0):
+    """
+    Rasterizes a diagram of dfa to a PNG file. Requires Pillow.
+    """
+    from PIL import Image, ImageDraw, ImageFont
+    (left, top), (width, height) = bounds(dfa)
+    image = Image.new('RGB', (max(1, math.ceil(width * scale)), max(1, math.ceil(height * scale))), 'white')
+    draw = ImageDraw.Draw(image)
+    try:
+        font = ImageFont.load_default(size=FONT_SIZE * scale)
+    except TypeError:  # Pillow before 10.1 has a single bitmap font size
+        font = ImageFont.load_default()
+
+    def to_pixels(point):
+        return (point[0] - left) * scale, (point[1] - top) * scale
+
+    line_width = max(1, round(scale))
+    for shape in shapes(dfa):
+        kind = shape[0]
+        if kind == 'line':
+            start, end = to_pixels(shape[1]), to_pixels(shape[2])
+            draw.line([start, end], fill='black', width=line_width)
+            draw.polygon(arrow_head(start, end, scale), fill='black')
+        elif kind == 'polygon':
+            draw.polygon([to_pixels(p) for p in shape[1]], outline='black', fill='black' if shape[2] else None)
+        elif kind == 'circle':
+            (x, y), r = to_pixels(shape[1]), geometry.CIR_RADIUS * scale
+            draw.ellipse([x - r, y - r, x + r, y + r], fill=shape[2], outline='black',
+                         width=max(1, round(shape[3] * scale)))
+        else:
+            draw.text(to_pixels(shape[1]), shape[2], fill='black', font=font, anchor='mm')
+    image.save(path)
+
+
+def arrow_head(start, end, scale=1.0):
+    # triangle with its tip at end, pointing away from start
+    dx, dy = end[0] - start[0], end[1] - start[1]
+    d = math.hypot(dx, dy) or 1.0
+    ux, uy = dx / d, dy / d
+    back = (end[0] - ux * ARROW_LENGTH * scale, end[1] - uy * ARROW_LENGTH * scale)
+    side = (-uy * ARROW_WIDTH * scale, ux * ARROW_WIDTH * scale)
+    return [end, (back[0] + side[0], back[1] + side[1]), (back[0] - side[0], back[1] - side[1])]
+
+
+def render_file(paths):
+    """
+    Renders one saved machine (.dfa, see dfafile.py, or .jff, see jflap.py).
+    Nondeterministic .jff automata are converted to DFAs first.
+    :param paths: (source file, image file)
+    :return: image file
+    """
+    source, dest = paths
+    if source.endswith('.jff'):
+        import jflap
+        machine = jflap.read_jff(source)
+        if not isinstance(machine, DFA):
+            machine = machine.to_dfa()
+    else:
+        machine = DFA.open(source)
+    render(machine, dest)
+    return dest
+
+
+def render_directory(source_dir, dest_dir, image_type='svg', workers=None):
+    """
+    Renders every .dfa and .jff file in source_dir into dest_dir across a process pool.
+    :param image_type: 'svg' or 'png'
+    :param workers: number of worker processes, None for one per core
+    :return: list of files written
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    os.makedirs(dest_dir, exist_ok=True)
+    jobs = []
+    for name in sorted(os.listdir(source_dir)):
+        stem, ext = os.path.splitext(name)
+        if ext in ('.jff', '.dfa'):
+            jobs.append((os.path.join(source_dir, name), os.path.join(dest_dir, stem + '.' + image_type)))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(render_file, jobs, chunksize=16))
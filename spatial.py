@@ -0,0 +1,100 @@
+# Spatial index
+# Uniform grid over the canvas used to find the states and transitions near a click
+# without testing every object on the canvas
+
+import math
+
+
+class GridIndex:
+    # vars:
+    # cell_size - width and height of one grid cell in canvas units
+    # cells {} - (column, row) -> set of items overlapping that cell
+    # boxes {} - item -> (x1, y1, x2, y2) bounding box it was indexed with
+    # order {} - item -> insertion number, so later (top-most) items can be preferred
+
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.boxes = {}
+        self.order = {}
+        self.counter = 0
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def __contains__(self, item):
+        return item in self.boxes
+
+    def cell_range(self, box):
+        size = self.cell_size
+        x1, y1, x2, y2 = box
+        for cx in range(math.floor(x1 / size), math.floor(x2 / size) + 1):
+            for cy in range(math.floor(y1 / size), math.floor(y2 / size) + 1):
+                yield cx, cy
+
+    def update(self, item, box):
+        # index item under box, replacing any earlier box; keeps its insertion number
+        old = self.boxes.get(item)
+        if old == box:
+            return
+        if old is not None:
+            self.unlink(item, old)
+        else:
+            self.order[item] = self.counter
+            self.counter += 1
+        self.boxes[item] = box
+        for cell in self.cell_range(box):
+            self.cells.setdefault(cell, set()).add(item)
+
+    def remove(self, item):
+        old = self.boxes.pop(item, None)
+        if old is not None:
+            self.unlink(item, old)
+            del self.order[item]
+
+    def unlink(self, item, box):
+        for cell in self.cell_range(box):
+            members = self.cells.get(cell)
+            if members is not None:
+                members.discard(item)
+                if not members:
+                    del self.cells[cell]
+
+    def query_point(self, x, y):
+        """
+        Items whose bounding box contains (x, y), most recently inserted first.
+        Callers still run their exact hit test on each.
+        """
+        size = self.cell_size
+        found = [item for item in self.cells.get((math.floor(x / size), math.floor(y / size)), ())
+                 if self.boxes[item][0] <= x <= self.boxes[item][2]
+                 and self.boxes[item][1] <= y <= self.boxes[item][3]]
+        found.sort(key=self.order.get, reverse=True)
+        return found
+
+    def query_box(self, box):
+        # items whose bounding box overlaps box, in no particular order
+        x1, y1, x2, y2 = box
+        found = set()
+        for cell in self.cell_range(box):
+            for item in self.cells.get(cell, ()):
+                bx1, by1, bx2, by2 = self.boxes[item]
+                if bx1 <= x2 and x1 <= bx2 and by1 <= y2 and y1 <= by2:
+                    found.add(item)
+        return found
+
+    def clear(self):
+        self.cells.clear()
+        self.boxes.clear()
+        self.order.clear()
+
+
+def segment_distance(p, a, b):
+    # distance from point p to the segment a-b
+    dx, dy = b.getX() - a.getX(), b.getY() - a.getY()
+    length = dx * dx + dy * dy
+    if length == 0:
+        return p.distanceTo(a)
+    t = ((p.getX() - a.getX()) * dx + (p.getY() - a.getY()) * dy) / length
+    t = max(0.0, min(1.0, t))
+    return math.hypot(p.getX() - (a.getX() + t * dx), p.getY() - (a.getY() + t * dy))
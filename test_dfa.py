@@ -0,0 +1,92 @@
+# Tests for DFA.py
+
+from DFA import DFA, DFANode
+
+
+def test_equivalent(ring):
+    result = ring(2).equivalent(ring(4, final=(0, 2)))
+    assert result
+    assert result.counterexample is None
+
+
+def test_not_equivalent_is_false(ring):
+    result = ring(3).equivalent(ring(2))
+    assert not result
+    assert result.counterexample == 'aa'
+
+
+def test_minimize(ring):
+    dfa = ring(6, final=(0, 3))
+    minimal = dfa.minimize()
+    assert len(minimal.nodes) == 3
+    assert minimal.equivalent(dfa)
+
+
+def test_minimize_chain():
+    # a chain where every state is distinguishable; splits peel one state off the tail at a time
+    dfa = DFA()
+    for i in range(500):
+        node = DFANode('q' + str(i), id=i, initial=(i == 0), final=(i == 499))
+        if i < 499:
+            node.add_transition('a', i + 1)
+        dfa.add_node(node)
+    dfa.initial = 0
+    minimal = dfa.minimize()
+    assert len(minimal.nodes) == 500
+    assert minimal.equivalent(dfa)
+
+
+def test_free_id_after_remove(ring):
+    dfa = ring(5)
+    dfa.remove_node(dfa.nodes[2])
+    ident = dfa.get_free_id()
+    assert ident == 2
+    assert dfa.add_node(DFANode('new', id=ident))
+    assert dfa.nodes[2].name == 'new'
+    assert dfa.get_free_id() == 5
+
+
+def test_large_chosen_id():
+    # ids skipped over by a caller's choice stay free, without being listed one by one
+    dfa = DFA()
+    assert dfa.add_node(DFANode('far', id=5000000))
+    assert dfa.add_node(DFANode('near', id=3))
+    assert [dfa.get_free_id() for _ in range(4)] == [0, 1, 2, 4]
+    assert len(dfa.ids) == 6
+
+
+def test_stream_rejects_bad_utf8():
+    dfa = DFA()
+    node = DFANode('q0', id=0, initial=True, final=True)
+    node.add_transition('é', 0)
+    dfa.add_node(node)
+    dfa.initial = 0
+    assert dfa.simulate_stream([b'\xc3\xa9', b'\xc3', b'\xa9'])
+    assert not dfa.simulate_stream([b'\xff'])
+    assert not dfa.simulate_stream([b'\xc3\xa9\xc3'])
+
+
+def test_set_initial_moves_the_mark(ring):
+    dfa = ring(3)
+    dfa.log_changes()
+    assert dfa.set_initial(2) == 0
+    assert dfa.initial == 2
+    assert [dfa.nodes[i].is_initial for i in range(3)] == [False, False, True]
+    assert len(dfa.pop_changes()) == 2  # 0 not initial, 2 initial
+
+
+def test_unchanged_status_is_not_logged(ring):
+    dfa = ring(3)
+    dfa.log_changes()
+    dfa.set_initial(1, False)
+    dfa.set_final(1, False)
+    dfa.set_final(0, True)
+    assert not dfa.pop_changes()
+
+
+def test_remove_node_returns_its_transitions(ring):
+    for compact in (False, True):
+        dfa = ring(3, compact=compact)
+        removed = dfa.remove_node(dfa.nodes[1])
+        assert removed.name == 'q1' and removed.transitions == {'a': 2}
+        assert 1 not in dfa.nodes and dfa.nodes[0].transitions == {}
@@ -0,0 +1,31 @@
+# Tests for dfafile.py: binary save/open round trips
+
+from DFA import DFA
+
+
+def test_round_trip(ring, tmp_path):
+    path = str(tmp_path / 'ring.dfa')
+    ring(100, final=range(0, 100, 3), reset='b').save(path)
+    loaded = DFA.open(path)
+    assert len(loaded.nodes) == 100
+    assert loaded.nodes[7].name == 'q7'
+    assert loaded.nodes[99].transitions == {'a': 0, 'b': 0}
+    assert loaded.accepts('aaa')
+    assert not loaded.accepts('aa')
+
+
+def test_save_over_open_file(ring, tmp_path):
+    # the opened DFA still reads its rows from the mapping of the file being replaced
+    path = str(tmp_path / 'ring.dfa')
+    ring(30000, final=range(0, 30000, 3), reset='b', compact=True).save(path)
+    loaded = DFA.open(path)
+    loaded.nodes[5].name = 'renamed'
+    loaded.save(path)
+
+    again = DFA.open(path)
+    assert len(again.nodes) == 30000
+    assert again.nodes[5].name == 'renamed'
+    assert again.nodes[29999].name == 'q29999'
+    assert again.nodes[29999].transitions == {'a': 0, 'b': 0}
+    assert again.accepts('a' * 3)
+    assert loaded.nodes[6].name == 'q6'
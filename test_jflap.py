@@ -0,0 +1,30 @@
+# Tests for jflap.py: reading and writing .jff files
+
+import jflap
+from DFA import DFA
+from NFA import NFA
+
+
+def test_round_trip(ring, tmp_path):
+    path = str(tmp_path / 'ring.jff')
+    jflap.write_jff(ring(5), path)
+    loaded = jflap.read_jff(path)
+    assert isinstance(loaded, DFA)
+    assert len(loaded.nodes) == 5
+    assert loaded.accepts('aaaaa') and not loaded.accepts('aa')
+
+
+def test_states_without_automaton_element(tmp_path):
+    # older JFLAP files put states and transitions straight under <structure>
+    path = tmp_path / 'old.jff'
+    path.write_text('<?xml version="1.0"?><structure><type>fa</type>'
+                    '<state id="0" name="start"><x>10.0</x><y>20.0</y><initial/></state>'
+                    '<state id="1"><final/></state>'
+                    '<transition><from>0</from><to>1</to><read>a</read></transition>'
+                    '<transition><from>0</from><to>0</to><read/></transition>'
+                    '</structure>')
+    loaded = jflap.read_jff(str(path))
+    assert isinstance(loaded, NFA)
+    assert loaded.nodes[0].name == 'start' and loaded.nodes[1].name == 'q1'
+    assert loaded.nodes[0].center.getX() == 10.0
+    assert loaded.accepts('a') and not loaded.accepts('aa')
@@ -0,0 +1,57 @@
+# Tests for memo.py: generator result caching
+
+import os
+import subprocess
+import sys
+
+import memo
+from DFA import DFA
+
+length = 3
+
+
+def transition(x, a):
+    return x + a if len(x) < length else x[1:] + a
+
+
+def accept(x):
+    return len(x) == length and x.count('a') in (0, length)
+
+
+def generate(cache):
+    return DFA.generate(['a', 'b'], transition, '', accept, cache)
+
+
+def test_saved_cache_is_reused(tmp_path):
+    path = str(tmp_path / 'cache.pkl')
+    cache = memo.GeneratorCache(path=path)
+    states = len(generate(cache).nodes)
+    cache.save()
+
+    cache = memo.GeneratorCache(path=path)
+    assert len(generate(cache).nodes) == states
+    assert cache.misses == 0 and cache.hits > 0
+
+
+def test_edited_global_misses(monkeypatch):
+    cache = memo.GeneratorCache()
+    assert len(generate(cache).nodes) == 15
+    monkeypatch.setitem(globals(), 'length', 4)
+    hits = cache.hits
+    assert len(generate(cache).nodes) == 31
+    assert cache.hits == hits
+
+
+def test_key_same_in_every_process():
+    # set constants iterate in a per-process hash order; the key must not depend on it
+    code = ('import memo\n'
+            'def f(x):\n'
+            "    return x in {'a', 'b', 'c', 'd', 'e', 'f'}\n"
+            'print(memo.function_key(f))\n')
+    here = os.path.dirname(os.path.abspath(__file__))
+    keys = set()
+    for seed in ('1', '2', '3'):
+        env = dict(os.environ, PYTHONHASHSEED=seed, PYTHONPATH=here)
+        keys.add(subprocess.run([sys.executable, '-c', code], env=env, check=True,
+                                capture_output=True, text=True).stdout)
+    assert len(keys) == 1
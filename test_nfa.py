@@ -0,0 +1,41 @@
+# Tests for NFA.py
+
+import random
+
+import NFA
+from NFA import NFANode, LAMBDA
+
+
+def random_nfa(states, seed):
+    rand = random.Random(seed)
+    nfa = NFA.NFA()
+    for i in range(states):
+        node = NFANode('q' + str(i), id=i, initial=(i == 0), final=(i % 5 == 0))
+        for c in 'ab':
+            node.add_transition(c, rand.randrange(states))
+        if rand.random() < 0.2:
+            node.add_transition(LAMBDA, rand.randrange(states))
+        nfa.add_node(node)
+    nfa.initial = 0
+    return nfa
+
+
+def test_step_past_chunk_budget(monkeypatch):
+    # once the successor tables are full, step ORs successors together and must agree with them
+    nfa = random_nfa(300, seed=3)
+    rand = random.Random(4)
+    strings = [''.join(rand.choice('ab') for _ in range(rand.randrange(20))) for _ in range(200)]
+    expected = [nfa.accepts(s) for s in strings]
+    monkeypatch.setattr(NFA, 'CHUNK_BUDGET', 0)
+    nfa.invalidate()
+    assert [nfa.accepts(s) for s in strings] == expected
+    assert nfa.compile().chunk_room == 0
+
+
+def test_to_dfa_accepts_the_same():
+    nfa = random_nfa(40, seed=1)
+    dfa = nfa.to_dfa()
+    rand = random.Random(2)
+    for _ in range(200):
+        s = ''.join(rand.choice('ab') for _ in range(rand.randrange(15)))
+        assert dfa.accepts(s) == nfa.accepts(s)
@@ -0,0 +1,272 @@
+# Viewport
+# Scrollable, zoomable read-only view of a large DFA
+# Only the states and transitions inside the visible region get canvas items. Zoomed far out,
+# states are binned into dots and transitions into bundles between the bins, so the number of
+# canvas items stays bounded however large the machine is
+
+import math
+
+from geometry import CIR_RADIUS
+from render import shapes
+from spatial import GridIndex
+
+DETAIL_LIMIT = 1500  # most states drawn as labelled circles with every transition
+LABEL_RADIUS = 8  # smallest on-screen circle radius (pixels) that still gets its labels
+DOT_SPACING = 8  # screen pixels per bin when states are drawn as dots
+BUNDLE_LIMIT = 2000  # most bundled transitions drawn at once, heaviest first
+ZOOM_STEP = 1.25
+
+
+class Viewport:
+    # vars:
+    # win - GraphWin drawn into; all items are tagged 'view'
+    # dfa - DFA shown, every node needs a center
+    # top - screen y the view starts at (below the toolbar)
+    # scale - screen pixels per world unit
+    # x, y - world coordinates of the top left corner of the view
+    # index - GridIndex of node ids by center
+    # levels {} - bin size exponent -> (bins, bundles), see bin_level
+    # pending - True while a redraw is queued
+
+    def __init__(self, win, dfa, top=0):
+        """
+        Shows dfa in win and binds panning (drag, arrow keys), zooming
+        (mouse wheel, +/-) and fitting the whole machine (Home).
+        :param top: screen rows above this are left to the toolbar
+        """
+        self.win = win
+        self.dfa = dfa
+        self.top = top
+        self.scale = 1.0
+        self.x = self.y = 0.0
+        self.index = GridIndex(cell_size=16 * CIR_RADIUS)
+        for ident, node in dfa.nodes.items():
+            c = node.center
+            self.index.update(ident, (c.getX(), c.getY(), c.getX(), c.getY()))
+        self.levels = {}
+        self.pending = False
+        self.drag = None
+
+        win.bind('<Button-1>', self.start_drag, add='+')
+        win.bind('<B1-Motion>', self.on_drag)
+        win.bind('<MouseWheel>', lambda e: self.zoom(ZOOM_STEP if e.delta > 0 else 1 / ZOOM_STEP, e.x, e.y))
+        win.bind('<Button-4>', lambda e: self.zoom(ZOOM_STEP, e.x, e.y))  # X11 wheel
+        win.bind('<Button-5>', lambda e: self.zoom(1 / ZOOM_STEP, e.x, e.y))
+        keys = win.master
+        keys.bind('<Left>', lambda e: self.pan(100, 0))
+        keys.bind('<Right>', lambda e: self.pan(-100, 0))
+        keys.bind('<Up>', lambda e: self.pan(0, 100))
+        keys.bind('<Down>', lambda e: self.pan(0, -100))
+        keys.bind('<plus>', lambda e: self.zoom(ZOOM_STEP))
+        keys.bind('<equal>', lambda e: self.zoom(ZOOM_STEP))
+        keys.bind('<minus>', lambda e: self.zoom(1 / ZOOM_STEP))
+        keys.bind('<Home>', lambda e: self.fit())
+        self.fit()
+
+    def view_size(self):
+        return self.win.getWidth(), self.win.getHeight() - self.top
+
+    def world_box(self):
+        # visible region in world coordinates
+        width, height = self.view_size()
+        return self.x, self.y, self.x + width / self.scale, self.y + height / self.scale
+
+    def to_screen(self, x, y):
+        return (x - self.x) * self.scale, self.top + (y - self.y) * self.scale
+
+    def fit(self):
+        # zoom and pan so the whole machine is visible
+        boxes = self.index.boxes.values()
+        if not boxes:
+            return
+        x1 = min(b[0] for b in boxes) - 2 * CIR_RADIUS
+        y1 = min(b[1] for b in boxes) - 2 * CIR_RADIUS
+        x2 = max(b[2] for b in boxes) + 2 * CIR_RADIUS
+        y2 = max(b[3] for b in boxes) + 2 * CIR_RADIUS
+        width, height = self.view_size()
+        self.scale = min(width / (x2 - x1), height / (y2 - y1))
+        self.x = (x1 + x2) / 2 - width / self.scale / 2
+        self.y = (y1 + y2) / 2 - height / self.scale / 2
+        self.schedule()
+
+    def pan(self, dx, dy):
+        # move the view by (dx, dy) screen pixels
+        self.x -= dx / self.scale
+        self.y -= dy / self.scale
+        self.schedule()
+
+    def zoom(self, factor, sx=None, sy=None):
+        # zoom by factor, keeping the world point under screen point (sx, sy) in place
+        width, height = self.view_size()
+        if sx is None:
+            sx, sy = width / 2, self.top + height / 2
+        wx, wy = self.x + sx / self.scale, self.y + (sy - self.top) / self.scale
+        self.scale *= factor
+        self.x, self.y = wx - sx / self.scale, wy - (sy - self.top) / self.scale
+        self.schedule()
+
+    def start_drag(self, e):
+        self.drag = (e.x, e.y)
+
+    def on_drag(self, e):
+        if self.drag is not None:
+            self.pan(e.x - self.drag[0], e.y - self.drag[1])
+            self.drag = (e.x, e.y)
+
+    def schedule(self):
+        # redraw once Tk is idle, so a burst of wheel or drag events costs one redraw
+        if not self.pending:
+            self.pending = True
+            self.win.after_idle(self.redraw)
+
+    def redraw(self):
+        self.pending = False
+        win = self.win
+        win.delete('view')
+        level = self.level()
+        bins, bundles = self.bin_level(level)
+        visible = self.visible_bins(bins, level)
+        if CIR_RADIUS * self.scale >= 1 and sum(bins[cell][0] for cell in visible) <= DETAIL_LIMIT:
+            self.draw_detail()
+        else:
+            self.draw_dots(bins, bundles, visible)
+        # keep the view under the toolbar
+        width, height = self.view_size()
+        win.create_rectangle(0, 0, width, self.top, fill='white', outline='', tags='view')
+        win.tag_lower('view')
+
+    def level(self):
+        # bin size exponent for the current zoom: bins are 2 ** level world units, at least DOT_SPACING
+        # pixels, but never smaller than a state, so zooming in further reuses the same bins
+        return max(math.ceil(math.log2(DOT_SPACING / self.scale)), self.finest_level())
+
+    def finest_level(self):
+        return math.floor(math.log2(CIR_RADIUS))
+
+    def bin_level(self, level):
+        """
+        Bins every state into square cells of 2 ** level world units. The
+        finest level is built from the DFA, each coarser one by merging the
+        bins of the level below. Levels are built once, on first use.
+        :return: (bins, bundles). bins: cell -> [states, x sum, y sum, any final, has initial];
+                bundles: list of (transitions, cell, cell) between different cells, heaviest first
+        """
+        if level not in self.levels:
+            if level <= self.finest_level():
+                bins, counts = self.bin_nodes(2.0 ** level)
+            else:
+                finer, finer_bundles = self.bin_level(level - 1)
+                bins = {}
+                for (cx, cy), entry in finer.items():
+                    merged = bins.get((cx >> 1, cy >> 1))
+                    if merged is None:
+                        bins[cx >> 1, cy >> 1] = list(entry)
+                    else:
+                        merged[0] += entry[0]
+                        merged[1] += entry[1]
+                        merged[2] += entry[2]
+                        merged[3] = merged[3] or entry[3]
+                        merged[4] = merged[4] or entry[4]
+                counts = {}
+                for n, (ax, ay), (bx, by) in finer_bundles:
+                    a, b = (ax >> 1, ay >> 1), (bx >> 1, by >> 1)
+                    if a != b:
+                        key = (a, b) if a < b else (b, a)
+                        counts[key] = counts.get(key, 0) + n
+            bundles = sorted(((n, a, b) for (a, b), n in counts.items()), reverse=True)
+            self.levels[level] = (bins, bundles)
+        return self.levels[level]
+
+    def bin_nodes(self, size):
+        # bins and transition counts between bins, straight from the DFA
+        bins = {}
+        cell_of = {}
+        for ident, node in self.dfa.nodes.items():
+            c = node.center
+            cell = (math.floor(c.getX() / size), math.floor(c.getY() / size))
+            cell_of[ident] = cell
+            entry = bins.get(cell)
+            if entry is None:
+                entry = bins[cell] = [0, 0.0, 0.0, False, False]
+            entry[0] += 1
+            entry[1] += c.getX()
+            entry[2] += c.getY()
+            entry[3] = entry[3] or node.is_final
+            entry[4] = entry[4] or ident == self.dfa.initial
+        counts = {}
+        for ident, node in self.dfa.nodes.items():
+            here = cell_of[ident]
+            for dest in node.transitions.values():
+                there = cell_of.get(dest)
+                if there is not None and there != here:
+                    key = (here, there) if here < there else (there, here)
+                    counts[key] = counts.get(key, 0) + 1
+        return bins, counts
+
+    def visible_bins(self, bins, level):
+        # set of occupied cells inside the view
+        size = 2.0 ** level
+        x1, y1, x2, y2 = self.world_box()
+        cx1, cy1 = math.floor(x1 / size), math.floor(y1 / size)
+        cx2, cy2 = math.floor(x2 / size), math.floor(y2 / size)
+        if (cx2 - cx1 + 1) * (cy2 - cy1 + 1) < len(bins):
+            return {(cx, cy) for cx in range(cx1, cx2 + 1) for cy in range(cy1, cy2 + 1) if (cx, cy) in bins}
+        return {cell for cell in bins if cx1 <= cell[0] <= cx2 and cy1 <= cell[1] <= cy2}
+
+    def draw_dots(self, bins, bundles, visible):
+        # low detail: one dot per occupied bin, one line per pair of bins joined by transitions
+        win = self.win
+        drawn = 0
+        for n, a, b in bundles:
+            if a in visible or b in visible:
+                (xa, ya), (xb, yb) = self.bin_center(bins[a]), self.bin_center(bins[b])
+                win.create_line(xa, ya, xb, yb, fill='gray60', width=min(1 + math.log2(n), 4), tags='view')
+                drawn += 1
+                if drawn == BUNDLE_LIMIT:
+                    break
+        for cell in visible:
+            entry = bins[cell]
+            x, y = self.bin_center(entry)
+            r = min(1.5 + math.log2(entry[0]), DOT_SPACING / 2)
+            color = 'plum' if entry[4] else 'gold' if entry[3] else 'gray30'
+            win.create_oval(x - r, y - r, x + r, y + r, fill=color, outline='', tags='view')
+
+    def bin_center(self, entry):
+        return self.to_screen(entry[1] / entry[0], entry[2] / entry[0])
+
+    def draw_detail(self):
+        # full detail: circles and transitions of the visible states, labels once circles are big enough
+        win, nodes = self.win, self.dfa.nodes
+        x1, y1, x2, y2 = self.world_box()
+        margin = CIR_RADIUS
+        visible = self.index.query_box((x1 - margin, y1 - margin, x2 + margin, y2 + margin))
+        r = CIR_RADIUS * self.scale
+        labels = r >= LABEL_RADIUS
+
+        edges = {}  # (source id, dest id) -> symbols, for transitions touching a visible state
+        incoming = self.dfa.reverse_index()
+        for ident in visible:
+            for c, dest in nodes[ident].transitions.items():
+                if dest in nodes:
+                    edges.setdefault((ident, dest), []).append(c)
+            for src, c in incoming.get(ident, ()):
+                if src not in visible:
+                    edges.setdefault((src, ident), []).append(c)
+        for symbols in edges.values():
+            symbols.sort()
+
+        def screen(point):
+            return self.to_screen(point[0], point[1])
+
+        for shape in shapes(self.dfa, visible, edges):
+            kind = shape[0]
+            if kind == 'line':
+                win.create_line(*screen(shape[1]), *screen(shape[2]), arrow='last', tags='view')
+            elif kind == 'polygon':
+                points = [c for p in shape[1] for c in screen(p)]
+                win.create_polygon(*points, fill='black' if shape[2] else '', outline='black', tags='view')
+            elif kind == 'circle':
+                x, y = screen(shape[1])
+                win.create_oval(x - r, y - r, x + r, y + r, fill=shape[2], width=shape[3], tags='view')
+            elif labels:
+                win.create_text(*screen(shape[1]), text=shape[2], tags='view')